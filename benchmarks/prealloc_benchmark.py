@@ -0,0 +1,55 @@
+"""预分配写入基准测试
+
+在本地启动支持Range的HTTP服务器，比较追加写入和预分配写入两种方式的吞吐量和每MB的CPU时间：
+    单连接: download_file，preallocate关闭/开启
+    分段:   download_file_segmented，各段写入独立文件后合并 / 写入预分配文件的对应位置
+
+默认在临时目录中测试，可指定目标目录以测试NAS或机械硬盘上的效果。
+
+用法: python benchmarks/prealloc_benchmark.py [文件大小MB] [重复次数] [目标目录]
+"""
+import os
+import sys
+import tempfile
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.transfer_benchmark import serve, measure, BenchAPIHandler
+from utils.downloader import SongDownloader
+
+
+def main():
+    size = int(float(sys.argv[1]) * 1024 * 1024) if len(sys.argv) > 1 else 200 * 1024 * 1024
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    target_dir = sys.argv[3] if len(sys.argv) > 3 else None
+
+    port_queue = multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve, args=(size, port_queue), daemon=True)
+    server.start()
+    url = f"http://127.0.0.1:{port_queue.get()}/file"
+
+    downloader = SongDownloader(BenchAPIHandler())
+    downloader.set_speed_limit(0)
+    downloader.segment_size = max(1, size // (downloader.segment_count * 2))
+
+    def single(url, filepath):
+        downloader.download_file(url, filepath)
+
+    def segmented(url, filepath):
+        downloader.download_file_segmented(url, filepath)
+
+    with tempfile.TemporaryDirectory(dir=target_dir) as temp_dir:
+        filepath = os.path.join(temp_dir, 'bench.flac')
+        print(f"文件大小: {size / (1024 * 1024):.0f} MB, 重复次数: {repeat}, 目录: {temp_dir}")
+        for preallocate in (False, True):
+            downloader.preallocate = preallocate
+            mode = "preallocated" if preallocate else "append"
+            measure(f"single ({mode})", single, url, filepath, size, repeat)
+            measure(f"segmented x{downloader.segment_count} ({mode})", segmented, url, filepath, size, repeat)
+
+    server.terminate()
+
+
+if __name__ == '__main__':
+    main()
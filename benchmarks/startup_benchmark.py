@@ -0,0 +1,90 @@
+"""启动时间基准测试
+
+每次在新的Python进程中测量：
+    cli:    导入utils.cli（命令行模式）所需的时间
+    import: 导入utils.ui（PyQt5和qfluentwidgets）所需的时间
+    window: 创建QApplication和MusicDownloaderUI并显示窗口所需的时间
+
+图形界面在offscreen平台上运行，不需要显示器。启动检查在后台线程中进行，不计入窗口创建时间；
+startup_cache.json存在且未过期时不会发出网络请求。指定--max-window-ms后，
+窗口创建时间的中位数超过该值时以退出码1结束，可用于发现启动时间的退化。
+
+用法: python benchmarks/startup_benchmark.py [--runs 5] [--max-window-ms 毫秒]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CLI_SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+import utils.cli
+print(json.dumps({'cli': time.perf_counter() - start, 'qt_loaded': any(m.startswith('PyQt5') for m in sys.modules)}))
+'''
+
+GUI_SCRIPT = '''
+import json, os, time
+start = time.perf_counter()
+import utils.ui
+imported = time.perf_counter()
+app = utils.ui.QApplication([])
+window = utils.ui.MusicDownloaderUI()
+window.show()
+app.processEvents()
+shown = time.perf_counter()
+print(json.dumps({'import': imported - start, 'window': shown - imported}), flush=True)
+os._exit(0)
+'''
+
+
+def run_script(script):
+    """在新进程中运行测量脚本，返回其输出的JSON"""
+    env = dict(os.environ)
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    result = subprocess.run([sys.executable, '-c', script], cwd=ROOT, env=env,
+                            capture_output=True, text=True, timeout=120)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "测量进程异常退出")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def report(name, samples):
+    """输出中位数和最大值（毫秒），返回中位数"""
+    median = statistics.median(samples) * 1000
+    print(f"{name:<10}{median:>10.1f} ms (median){max(samples) * 1000:>10.1f} ms (max)")
+    return median
+
+
+def main():
+    parser = argparse.ArgumentParser(description="测量命令行和图形界面的启动时间")
+    parser.add_argument('--runs', type=int, default=5, help="每项测量的次数")
+    parser.add_argument('--max-window-ms', type=float, help="窗口创建时间中位数的上限（毫秒）")
+    args = parser.parse_args()
+
+    cli_results = [run_script(CLI_SCRIPT) for _ in range(args.runs)]
+    report("cli", [result['cli'] for result in cli_results])
+    if any(result['qt_loaded'] for result in cli_results):
+        print("警告: 命令行模式加载了PyQt5")
+        return 1
+
+    try:
+        gui_results = [run_script(GUI_SCRIPT) for _ in range(args.runs)]
+    except RuntimeError as e:
+        print(f"无法测量图形界面启动时间: {e}")
+        return 0
+    report("import", [result['import'] for result in gui_results])
+    window_median = report("window", [result['window'] for result in gui_results])
+
+    if args.max_window_ms is not None and window_median > args.max_window_ms:
+        print(f"窗口创建时间 {window_median:.1f} ms 超过上限 {args.max_window_ms:.1f} ms")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""歌曲列表内存占用基准测试
+
+生成一个合成歌单的JSON响应（默认100000首歌曲，歌手在5000个名字中重复出现），分别整理为：
+    dict:  原来的{'name', 'artist', 'id'}字典，ID为字符串，下载结果为{'song', 'success', 'message'}字典
+    track: Track对象（__slots__，ID为int，歌手名经sys.intern去重），下载结果为(song, success, message)元组
+
+用tracemalloc测量整理后的歌曲列表和下载结果列表占用的内存（解析JSON的中间数据已释放）。
+
+用法: python benchmarks/track_memory_benchmark.py [--tracks 100000] [--artists 5000]
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.profiles import PlaylistApiProfile
+
+PROFILE = PlaylistApiProfile({
+    'name': 'benchmark',
+    'request_format': '',
+    'response_type': 'json',
+    'data_paths': {'songs': 'result.tracks', 'song_name': 'name', 'artist': 'ar[0].name', 'song_id': 'id'}
+})
+
+
+def build_response(track_count, artist_count):
+    """生成合成歌单的JSON响应"""
+    tracks = [
+        {'id': 400000000 + i, 'name': f"Song {i}", 'ar': [{'id': i % artist_count, 'name': f"Artist {i % artist_count}"}]}
+        for i in range(track_count)
+    ]
+    return json.dumps({'code': 200, 'result': {'tracks': tracks}}, ensure_ascii=False).encode('utf-8')
+
+
+def normalize_dicts(body):
+    """原来的整理方式：每首歌一个字典"""
+    songs = json.loads(body)['result']['tracks']
+    return [{'name': song['name'], 'artist': song['ar'][0]['name'], 'id': str(song['id'])} for song in songs]
+
+
+def normalize_tracks(body):
+    """PlaylistApiProfile整理为Track列表"""
+    return PROFILE.normalize(PROFILE.find_songs(json.loads(body)))
+
+
+def dict_results(songs):
+    """原来的下载结果列表"""
+    return [{'song': song, 'success': True, 'message': "ok"} for song in songs]
+
+
+def tuple_results(songs):
+    """现在的下载结果列表"""
+    return [(song, True, "ok") for song in songs]
+
+
+def measure(build, *args):
+    """返回build(*args)的结果及其在内存中保留的字节数"""
+    gc.collect()
+    tracemalloc.start()
+    result = build(*args)
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比较歌曲列表的内存占用")
+    parser.add_argument('--tracks', type=int, default=100000, help="歌曲数")
+    parser.add_argument('--artists', type=int, default=5000, help="不同歌手数")
+    args = parser.parse_args()
+
+    body = build_response(args.tracks, args.artists)
+    rows = []
+    for name, normalize, wrap in (('dict', normalize_dicts, dict_results), ('track', normalize_tracks, tuple_results)):
+        songs, songs_bytes = measure(normalize, body)
+        results, results_bytes = measure(wrap, songs)
+        assert len(songs) == args.tracks
+        rows.append((name, songs_bytes, results_bytes))
+        del songs, results
+
+    print(f"{'':<8}{'songs':>12}{'results':>12}{'total':>12}{'per track':>12}")
+    for name, songs_bytes, results_bytes in rows:
+        total = songs_bytes + results_bytes
+        print(f"{name:<8}{songs_bytes / 2**20:>9.1f} MB{results_bytes / 2**20:>9.1f} MB"
+              f"{total / 2**20:>9.1f} MB{total / args.tracks:>10.0f} B")
+    base, current = sum(rows[0][1:]), sum(rows[1][1:])
+    print(f"内存减少 {(1 - current / base) * 100:.1f}%")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
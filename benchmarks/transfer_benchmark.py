@@ -0,0 +1,116 @@
+"""下载传输路径基准测试
+
+在本地启动HTTP服务器（独立进程，避免计入客户端CPU时间），分别用旧的1KB分块写入方式
+和当前的SongDownloader.download_file下载同一个文件，输出吞吐量（MB/s）和每MB的CPU时间。
+
+用法: python benchmarks/transfer_benchmark.py [文件大小MB] [重复次数]
+"""
+import os
+import re
+import sys
+import tempfile
+import time
+import multiprocessing
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.session import get_session
+from utils.downloader import SongDownloader
+
+
+class FileHandler(BaseHTTPRequestHandler):
+    """返回固定大小随机数据的请求处理器，支持单个Range请求"""
+    protocol_version = 'HTTP/1.1'
+    data = b''
+
+    def do_GET(self):
+        start, end = 0, len(self.data) - 1
+        match = re.match(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+        if match:
+            start = int(match.group(1))
+            end = min(int(match.group(2)), end) if match.group(2) else end
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{len(self.data)}')
+        else:
+            self.send_response(200)
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(end - start + 1))
+        self.end_headers()
+        self.wfile.write(memoryview(self.data)[start:end + 1])
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(size, port_queue):
+    """服务器进程入口"""
+    FileHandler.data = os.urandom(size)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FileHandler)
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+class BenchAPIHandler:
+    """只提供SongDownloader所需配置的API处理器，不使用下载清单，不在工作目录中创建manifest.db"""
+    config = {'apis': {'song_download': {}}, 'download': {'manifest_path': ''}}
+
+    def get_default_quality(self):
+        return 'standard'
+
+
+def legacy_download(url, filepath):
+    """旧的下载实现：1KB分块，每块都检查一次时间"""
+    with get_session().get(url, stream=True, timeout=30) as response:
+        response.raise_for_status()
+        with open(filepath, 'wb') as file:
+            start_time = time.time()
+            downloaded = 0
+            for chunk in response.iter_content(chunk_size=1024):
+                if chunk:
+                    file.write(chunk)
+                    downloaded += len(chunk)
+                    elapsed = time.time() - start_time
+
+
+def measure(name, func, url, filepath, size, repeat):
+    """运行多次下载并输出平均吞吐量和每MB的CPU时间"""
+    wall_total = 0
+    cpu_total = 0
+    for _ in range(repeat):
+        if os.path.exists(filepath):
+            os.remove(filepath)
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        func(url, filepath)
+        cpu_total += time.process_time() - cpu_start
+        wall_total += time.perf_counter() - wall_start
+        assert os.path.getsize(filepath) == size
+    megabytes = size / (1024 * 1024) * repeat
+    print(f"{name:<28}{megabytes / wall_total:>10.1f} MB/s{cpu_total / megabytes * 1000:>12.2f} ms CPU/MB")
+
+
+def main():
+    size = int(float(sys.argv[1]) * 1024 * 1024) if len(sys.argv) > 1 else 100 * 1024 * 1024
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    port_queue = multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve, args=(size, port_queue), daemon=True)
+    server.start()
+    url = f"http://127.0.0.1:{port_queue.get()}/file"
+
+    downloader = SongDownloader(BenchAPIHandler())
+    downloader.set_speed_limit(0)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        filepath = os.path.join(temp_dir, 'bench.mp3')
+        print(f"文件大小: {size / (1024 * 1024):.0f} MB, 重复次数: {repeat}")
+        measure("legacy (1 KB chunks)", legacy_download, url, filepath, size, repeat)
+        measure(f"download_file ({downloader.buffer_size // 1024} KB buffer)", downloader.download_file,
+                url, filepath, size, repeat)
+
+    server.terminate()
+
+
+if __name__ == '__main__':
+    main()
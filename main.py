@@ -1,4 +1,10 @@
-from utils.ui import main
+import sys
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if len(sys.argv) > 1:
+        # 带参数时以命令行模式运行，不加载PyQt
+        from utils.cli import main
+        sys.exit(main())
+    else:
+        from utils.ui import main
+        main()
@@ -0,0 +1,121 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from utils.api import APIHandler
+from utils.circuit import CircuitOpenError
+
+# 测试用连接池大小，失败的请求数超过它时，没有归还的连接会让后续请求一直等待
+POOL_MAXSIZE = 2
+
+
+class ErrorHandler(BaseHTTPRequestHandler):
+    """所有请求都返回server.status，响应体足够大，不读取完就不会释放连接"""
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.hits += 1
+        body = b'x' * 65536
+        self.send_response(self.server.status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class RequestWithRetryTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), ErrorHandler)
+        self.server.daemon_threads = True
+        self.server.status = 404
+        self.server.hits = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+        config = {
+            'apis': {
+                'song_download': {'request_format': self.base_url + '/url?id={song_id}', 'request_interval': 1},
+                'playlists': []
+            },
+            'circuit_breaker': {'failure_threshold': 3, 'recovery_timeout': 0.2, 'probe_timeout': 0.2},
+            'http': {'pool_connections': 1, 'pool_maxsize': POOL_MAXSIZE, 'pool_block': True},
+            'playlist_cache': {'path': ''},
+            'playlist_hedge': {'stats_path': ''}
+        }
+        fd, self.config_path = tempfile.mkstemp(suffix='.json')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(config, f)
+        self.handler = APIHandler(self.config_path)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        os.remove(self.config_path)
+
+    def test_failed_stream_requests_release_connections(self):
+        """stream=True的失败请求超过连接池大小时，后续请求不会因连接未归还而卡住"""
+        errors = []
+
+        def run():
+            for i in range(POOL_MAXSIZE * 3):
+                try:
+                    self.handler.request_with_retry(f"{self.base_url}/playlist?id={i}", max_retries=2, stream=True)
+                except requests.HTTPError as e:
+                    errors.append(e.response.status_code)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        thread.join(10)
+        self.assertFalse(thread.is_alive(), "失败的流式请求没有归还连接，后续请求一直在等待连接池")
+        self.assertEqual(errors, [404] * (POOL_MAXSIZE * 3))
+
+    def test_each_failed_attempt_counts_toward_circuit(self):
+        """每次失败的尝试都计入熔断器，达到阈值后不再重试"""
+        self.server.status = 500
+        with self.assertRaises(requests.HTTPError):
+            self.handler.request_with_retry(f"{self.base_url}/url", max_retries=5)
+        self.assertEqual(self.server.hits, 3)
+        self.assertEqual(self.handler.get_circuit_states()['song_download'], 'open')
+        with self.assertRaises(CircuitOpenError):
+            self.handler.request_with_retry(f"{self.base_url}/url", max_retries=5)
+        self.assertEqual(self.server.hits, 3)
+
+    def test_throttling_does_not_open_circuit(self):
+        """429限流由请求间隔控制器处理，不计入熔断器"""
+        self.server.status = 429
+        with self.assertRaises(requests.HTTPError):
+            self.handler.request_with_retry(f"{self.base_url}/url", max_retries=5)
+        self.assertEqual(self.server.hits, 5)
+        self.assertEqual(self.handler.get_circuit_states()['song_download'], 'closed')
+
+    def test_half_open_probe_is_single_attempt(self):
+        """半开状态下的探测请求只尝试一次，等待探测结果的请求超时后直接失败"""
+        self.server.status = 500
+        with self.assertRaises(requests.HTTPError):
+            self.handler.request_with_retry(f"{self.base_url}/url", max_retries=3)
+        time.sleep(0.3)
+        hits = self.server.hits
+        with self.assertRaises(requests.HTTPError):
+            self.handler.request_with_retry(f"{self.base_url}/url", max_retries=3)
+        self.assertEqual(self.server.hits, hits + 1)
+        self.assertEqual(self.handler.get_circuit_states()['song_download'], 'open')
+
+        breaker = self.handler.get_circuit_breaker()
+        breaker.opened_at -= 1
+        self.assertTrue(breaker.before_request())
+        start = time.monotonic()
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_request()
+        self.assertLess(time.monotonic() - start, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
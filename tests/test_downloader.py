@@ -0,0 +1,124 @@
+import os
+import re
+import shutil
+import socket
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from utils.downloader import SongDownloader
+
+DATA = bytes(range(256)) * 4096
+SEGMENT_SIZE = 256 * 1024
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """返回DATA，支持单个Range请求"""
+
+    def do_GET(self):
+        match = re.match(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+        if match:
+            start = int(match.group(1))
+            end = int(match.group(2)) if match.group(2) else len(DATA) - 1
+            if start >= len(DATA):
+                self.send_response(416)
+                self.send_header('Content-Range', f"bytes */{len(DATA)}")
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            body = DATA[start:end + 1]
+            self.send_response(206)
+            self.send_header('Content-Range', f"bytes {start}-{end}/{len(DATA)}")
+        else:
+            body = DATA
+            self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubApiHandler:
+    config = {
+        'download': {
+            'manifest_path': '',
+            'preallocate': True,
+            'segmented': {'enabled': True, 'segment_size': SEGMENT_SIZE, 'segment_count': 4}
+        }
+    }
+
+    def get_default_quality(self):
+        return 'standard'
+
+
+class PreallocatedDownloadTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), RangeHandler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/file"
+        self.root = tempfile.mkdtemp()
+        self.filepath = os.path.join(self.root, 'song.mp3')
+        self.downloader = SongDownloader(StubApiHandler())
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.root)
+
+    def interrupt_preallocated_download(self):
+        """分段下载时第二段失败，留下预分配的文件和进度"""
+        download_region = self.downloader.download_region
+
+        def flaky(url, part_path, start, end, progress, index):
+            if index == 1:
+                raise IOError("connection reset")
+            return download_region(url, part_path, start, end, progress, index)
+
+        self.downloader.download_region = flaky
+        with self.assertRaises(IOError):
+            self.downloader.download_file(self.url, self.filepath, segmented=True)
+        self.downloader.download_region = download_region
+        self.assertFalse(os.path.exists(self.filepath))
+
+    def test_single_stream_retry_after_interrupted_preallocation(self):
+        """预分配下载中断后退回单连接下载，不会把未写完的预分配文件当作已下载完成"""
+        self.interrupt_preallocated_download()
+        self.downloader.download_file(self.url, self.filepath, segmented=False)
+        with open(self.filepath, 'rb') as f:
+            self.assertEqual(f.read(), DATA)
+
+    def test_legacy_preallocated_part_is_discarded(self):
+        """旧版本预分配下载留下的.part和.part.progress不会被当作续传的起点"""
+        with open(self.filepath + '.part', 'wb') as f:
+            f.write(b'\0' * len(DATA))
+        with open(self.filepath + '.part.progress', 'w', encoding='utf-8') as f:
+            f.write('{}')
+        self.downloader.download_file(self.url, self.filepath, segmented=False)
+        with open(self.filepath, 'rb') as f:
+            self.assertEqual(f.read(), DATA)
+        self.assertFalse(os.path.exists(self.filepath + '.part.progress'))
+
+    def test_segmented_resume_after_interruption(self):
+        """预分配下载中断后再次分段下载，从进度继续并得到完整的文件"""
+        self.interrupt_preallocated_download()
+        self.downloader.download_file(self.url, self.filepath, segmented=True)
+        with open(self.filepath, 'rb') as f:
+            self.assertEqual(f.read(), DATA)
+
+    def test_probe_network_error_is_raised(self):
+        """探测Range支持时的网络错误向上抛出，不当作服务器不支持Range"""
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        with self.assertRaises(requests.ConnectionError):
+            self.downloader.probe_range_support(f"http://127.0.0.1:{port}/file")
+
+
+if __name__ == '__main__':
+    unittest.main()
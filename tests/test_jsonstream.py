@@ -0,0 +1,166 @@
+import json
+import unittest
+
+from utils.jsonstream import JsonArrayStream, iter_array_items
+
+SONG_PATHS = [(), ('result', 'tracks'), ('playlist', 'tracks'), ('tracks',)]
+TRACK_IDS = ('playlist', 'trackIds')
+CHUNK_SIZES = (1, 2, 3, 7, 64, 1 << 20)
+
+
+def make_tracks(count):
+    """包含转义字符、多字节字符、括号、数字和嵌套结构的歌曲"""
+    return [
+        {
+            'id': 1000 + i,
+            'name': f"歌曲 {i} \"[live]\" {{x}} \\ é\U0001f3b5",
+            'ar': [{'id': i, 'name': f"Artist,{i}]"}],
+            'dt': 123.5e-2 * i,
+            'fee': None,
+            'st': i % 2 == 0,
+            'al': {'pic': -i, 'tns': []}
+        }
+        for i in range(count)
+    ]
+
+
+def split(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def collect(data, size, paths=SONG_PATHS, capture=()):
+    """按size字节分块解析，返回(所有元素, captured)"""
+    captured = {}
+    items = []
+    for batch in iter_array_items(split(data, size), paths, capture=capture, captured=captured):
+        items.extend(batch)
+    return items, captured
+
+
+class IterArrayItemsTest(unittest.TestCase):
+    def assert_same_as_json_loads(self, document, expected_path, capture=()):
+        data = json.dumps(document, ensure_ascii=False).encode('utf-8')
+        expected = json.loads(data)
+        for step in expected_path:
+            expected = expected[step]
+        for size in CHUNK_SIZES:
+            with self.subTest(chunk_size=size):
+                items, captured = collect(data, size, capture=capture)
+                self.assertEqual(items, expected)
+                for path in capture:
+                    value = json.loads(data)
+                    for step in path:
+                        value = value[step]
+                    self.assertEqual(captured[path], value)
+
+    def test_root_list(self):
+        self.assert_same_as_json_loads(make_tracks(20), ())
+
+    def test_result_tracks(self):
+        document = {'code': 200, 'message': "a}b]", 'result': {'name': "x", 'tracks': make_tracks(15), 'id': 1}}
+        self.assert_same_as_json_loads(document, ('result', 'tracks'))
+
+    def test_playlist_tracks(self):
+        document = {'playlist': {'creator': {'tracks': "not a list"}, 'tracks': make_tracks(15)}, 'code': 200}
+        self.assert_same_as_json_loads(document, ('playlist', 'tracks'))
+
+    def test_first_matching_path_wins(self):
+        """按响应中出现的顺序，取最先出现的值为数组的候选路径"""
+        document = {'tracks': {'count': 3}, 'result': {'tracks': make_tracks(3)}, 'playlist': {'tracks': make_tracks(5)}}
+        self.assert_same_as_json_loads(document, ('result', 'tracks'))
+
+    def test_empty_array(self):
+        self.assert_same_as_json_loads({'result': {'tracks': []}}, ('result', 'tracks'))
+
+    def test_track_ids_after_tracks(self):
+        track_ids = [{'id': 1000 + i, 'v': i} for i in range(50)]
+        document = {'playlist': {'tracks': make_tracks(10), 'trackIds': track_ids}}
+        self.assert_same_as_json_loads(document, ('playlist', 'tracks'), capture=(TRACK_IDS,))
+
+    def test_track_ids_before_tracks(self):
+        track_ids = [{'id': 1000 + i, 'v': i} for i in range(50)]
+        document = {'playlist': {'trackIds': track_ids, 'name': "x", 'tracks': make_tracks(10)}}
+        self.assert_same_as_json_loads(document, ('playlist', 'tracks'), capture=(TRACK_IDS,))
+
+    def test_missing_capture(self):
+        """要保存的路径不存在时不写入captured，仍返回全部元素"""
+        data = json.dumps({'playlist': {'tracks': make_tracks(5)}}).encode('utf-8')
+        for size in CHUNK_SIZES:
+            items, captured = collect(data, size, capture=(TRACK_IDS,))
+            self.assertEqual(len(items), 5)
+            self.assertEqual(captured, {})
+
+    def test_no_matching_path(self):
+        data = json.dumps({'code': 404, 'msg': "not found", 'data': [1, 2]}).encode('utf-8')
+        for size in CHUNK_SIZES:
+            self.assertEqual(collect(data, size), ([], {}))
+
+    def test_scalar_items(self):
+        """数组元素为数字时不会在数字被分块截断处提前解码"""
+        document = {'tracks': [1, 22, 333.25, -4e10, 5, True, None, "6"]}
+        self.assert_same_as_json_loads(document, ('tracks',))
+
+    def test_utf8_bom(self):
+        data = '﻿'.encode('utf-8') + json.dumps(make_tracks(3), ensure_ascii=False).encode('utf-8')
+        for size in CHUNK_SIZES:
+            self.assertEqual(collect(data, size)[0], make_tracks(3))
+
+    def test_stops_reading_after_array(self):
+        """找到的数组结束且没有要保存的值时，不再读取剩余的字节块"""
+        data = json.dumps({'tracks': make_tracks(3), 'rest': 'x' * 1000}).encode('utf-8')
+        chunks = split(data, 16)
+        consumed = []
+
+        def source():
+            for chunk in chunks:
+                consumed.append(chunk)
+                yield chunk
+
+        items = [item for batch in iter_array_items(source(), SONG_PATHS) for item in batch]
+        self.assertEqual(items, make_tracks(3))
+        self.assertLess(len(consumed), len(chunks))
+
+    def test_truncated_input(self):
+        """在数组结束之前被截断时抛出ValueError"""
+        data = json.dumps({'result': {'tracks': make_tracks(5)}}).encode('utf-8')
+        for cut in (1, 20, len(data) // 3, len(data) // 2, len(data) - 3):
+            for size in (1, 7, 1 << 20):
+                with self.subTest(cut=cut, chunk_size=size), self.assertRaises(ValueError):
+                    collect(data[:cut], size)
+
+    def test_content_after_array_is_not_read(self):
+        """数组结束后不再解析剩余内容，之后被截断的响应也能得到完整的数组"""
+        data = json.dumps({'result': {'tracks': make_tracks(5)}}).encode('utf-8')
+        for size in CHUNK_SIZES:
+            self.assertEqual(collect(data[:-1], size)[0], make_tracks(5))
+
+    def test_truncated_after_array(self):
+        """数组之后被截断，需要保存的值还没出现时同样报错"""
+        data = json.dumps({'playlist': {'tracks': make_tracks(2), 'trackIds': [1, 2, 3]}}).encode('utf-8')
+        with self.assertRaises(ValueError):
+            collect(data[:-8], 7, capture=(TRACK_IDS,))
+
+    def test_malformed_input(self):
+        for text in ('{"tracks": [1 2]}', '{"tracks" [1]}', '{"a": 1 "tracks": [1]}', '{"tracks": [1,]}'):
+            with self.subTest(text=text), self.assertRaises(ValueError):
+                collect(text.encode('utf-8'), 3)
+
+
+class JsonArrayStreamTest(unittest.TestCase):
+    def test_items_arrive_incrementally(self):
+        """每个字节块只返回已完整接收的元素"""
+        tracks = make_tracks(10)
+        data = json.dumps({'result': {'tracks': tracks}}, ensure_ascii=False)
+        stream = JsonArrayStream(SONG_PATHS)
+        received = []
+        half = stream.feed(data[:len(data) // 2])
+        received.extend(half)
+        self.assertTrue(0 < len(half) < len(tracks))
+        received.extend(stream.feed(data[len(data) // 2:]))
+        received.extend(stream.close())
+        self.assertEqual(received, tracks)
+        self.assertTrue(stream.done)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils.api import APIHandler
+from utils.downloader import SongDownloader
+from utils.sync import PlaylistSyncer
+from utils.track import Track
+
+TRACK_COUNT = 20
+# 歌单API只返回前几首歌曲，其余歌曲需要通过歌曲详情API获取
+FIRST_PAGE = 3
+LIST_ID = '1'
+QUALITY = 'standard'
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """/playlist返回第一页歌曲和完整的trackIds（server.playlist_status不为200时返回该状态），/detail总是返回500"""
+
+    def do_GET(self):
+        if self.path.startswith('/playlist') and self.server.playlist_status == 200:
+            tracks = [{'id': 1000 + i, 'name': f"s{i}", 'ar': [{'name': 'a'}]} for i in range(FIRST_PAGE)]
+            track_ids = [{'id': 1000 + i} for i in range(TRACK_COUNT)]
+            body = json.dumps({'playlist': {'tracks': tracks, 'trackIds': track_ids}}).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+        else:
+            body = b'error'
+            self.send_response(self.server.playlist_status if self.path.startswith('/playlist') else 500)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class IncompletePlaylistSyncTest(unittest.TestCase):
+    """上次同步了完整的歌单，这次只能获取到部分歌曲时不能把其余歌曲当作已移除"""
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        self.server.daemon_threads = True
+        self.server.playlist_status = 200
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+        self.root = tempfile.mkdtemp()
+        self.save_path = os.path.join(self.root, 'music')
+        data_paths = {'song_name': 'name', 'artist': 'ar[0].name', 'song_id': 'id'}
+        config = {
+            'apis': {
+                'song_download': {'request_format': base_url + '/url?id={song_id}', 'request_interval': 1,
+                                  'default_quality': QUALITY},
+                'playlists': [{'name': 'stub', 'request_format': base_url + '/playlist?id={list_id}',
+                               'response_type': 'json', 'data_paths': data_paths}],
+                'song_detail': {'request_format': base_url + '/detail?ids={ids}', 'request_interval': 1,
+                                'data_paths': data_paths}
+            },
+            'download': {'manifest_path': os.path.join(self.root, 'manifest.db')},
+            'playlist_cache': {'path': os.path.join(self.root, 'playlist_cache')},
+            'playlist_hedge': {'stats_path': ''}
+        }
+        self.config_path = os.path.join(self.root, 'config.json')
+        with open(self.config_path, 'w', encoding='utf-8') as f:
+            json.dump(config, f)
+        self.handler = APIHandler(self.config_path)
+        self.downloader = SongDownloader(self.handler)
+        self.syncer = PlaylistSyncer(self.downloader)
+
+        # 上次同步下载了完整的歌单
+        self.songs = [Track(1000 + i, f"s{i}", 'a') for i in range(TRACK_COUNT)]
+        os.makedirs(self.save_path)
+        self.paths = []
+        for song in self.songs:
+            path = self.downloader.build_filepath(song, self.save_path)
+            with open(path, 'wb') as f:
+                f.write(b'x')
+            self.downloader.manifest.record(song.id, QUALITY, path, 1)
+            self.paths.append(path)
+        self.snapshot = [str(song.id) for song in self.songs]
+        self.downloader.manifest.save_playlist_snapshot(LIST_ID, self.save_path, self.snapshot)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.downloader.manifest.close()
+        shutil.rmtree(self.root)
+
+    def assert_nothing_removed(self, result):
+        self.assertFalse(result['complete'])
+        self.assertEqual(result['removed'], 0)
+        self.assertTrue(all(os.path.exists(path) for path in self.paths))
+        self.assertEqual(self.downloader.manifest.get_playlist_snapshot(LIST_ID, self.save_path), self.snapshot)
+
+    def test_song_detail_failure_does_not_delete(self):
+        """歌曲详情API失败时只得到第一页歌曲，同步不删除其余歌曲，也不更新快照"""
+        songs = self.handler.get_playlist_songs(LIST_ID, use_cache=False)
+        self.assertEqual(len(songs), FIRST_PAGE)
+        self.assertFalse(songs.complete)
+
+        result = self.syncer.sync(LIST_ID, self.save_path, QUALITY, removed_action='delete')
+        self.assert_nothing_removed(result)
+
+    def test_stale_cache_does_not_delete(self):
+        """歌单API失败时退回过期的缓存，同步不据此删除歌曲"""
+        self.handler.playlist_cache.set('stub', LIST_ID, self.songs[:FIRST_PAGE], '"v1"')
+        self.server.playlist_status = 500
+
+        result = self.syncer.sync(LIST_ID, self.save_path, QUALITY, removed_action='delete')
+        self.assert_nothing_removed(result)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,12 +1,48 @@
 import requests
 import json
 import os
+import queue
 import sys
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from utils.session import configure_session, get_session
+from utils.ratelimit import AdaptiveRateLimiter
+from utils.cache import TTLCache, PlaylistCache
+from utils.apistats import EndpointStats
+from utils.circuit import CircuitBreaker, CircuitOpenError
+from utils.profiles import compile_path, compile_playlist_profiles, compile_song_detail_profile
+from utils.track import TrackList
+
+# 流式读取歌单响应时每次读取的字节数
+PLAYLIST_CHUNK_SIZE = 65536
 
 class APIHandler:
     def __init__(self, config_path='config.json'):
         self.config = self.load_config(config_path)
+        # 歌单API配置在加载时编译一次，解析响应时不再查找和解析data_paths
+        self.playlist_profiles = compile_playlist_profiles(self.config['apis']['playlists'])
+        # 歌曲详情API，歌单API只返回第一页歌曲时按完整的ID列表批量获取其余歌曲，未配置时为None
+        self.song_detail_profile = compile_song_detail_profile(self.config['apis'].get('song_detail'))
+        # 按配置初始化全局共享的连接池
+        configure_session(self.config)
+        # 每个API端点独立的自适应请求间隔控制器
+        self.rate_limiters = {}
+        self.rate_limiters_lock = threading.Lock()
+        # 每个API端点独立的熔断器，状态变化时通知circuit_listeners中的回调
+        self.circuit_breakers = {}
+        self.circuit_listeners = []
+        # 歌曲下载链接缓存，有效期（秒）应与直链签名的有效期一致
+        self.url_cache = TTLCache(self.config['apis']['song_download'].get('url_ttl', 600))
+        # 歌单歌曲列表的磁盘缓存，playlist_cache.path设为空时不使用
+        playlist_cache_config = self.config.get('playlist_cache', {})
+        playlist_cache_path = playlist_cache_config.get('path', 'playlist_cache')
+        self.playlist_cache = PlaylistCache(playlist_cache_path) if playlist_cache_path else None
+        # API不支持ETag/Last-Modified时缓存的有效期（秒），可在各歌单API中用cache_ttl单独设置
+        self.playlist_cache_ttl = playlist_cache_config.get('ttl', 600)
+        # 各歌单API的延迟和成功率统计，用于决定请求顺序，playlist_hedge.stats_path设为空时不保存到文件
+        self.playlist_stats = EndpointStats(self.config.get('playlist_hedge', {}).get('stats_path', 'api_stats.json'))
     
     def load_config(self, config_path):
         """加载配置文件"""
@@ -18,139 +54,434 @@ class APIHandler:
         with open(config_path, 'r', encoding='utf-8') as f:
             return json.load(f)
     
-    def request_with_retry(self, url, max_retries=3):
-        """带重试机制的请求方法"""
-        # 获取请求间隔（毫秒）
-        request_interval = self.config['apis']['song_download'].get('request_interval', 1000) / 1000  # 转换为秒
+    def get_api_config(self, endpoint):
+        """根据端点名称获取API配置，song_download为下载API，song_detail为歌曲详情API，其他为歌单API的name"""
+        if endpoint in ('song_download', 'song_detail'):
+            return self.config['apis'].get(endpoint, {})
+        for api in self.config['apis']['playlists']:
+            if api['name'] == endpoint:
+                return api
+        return {}
+    
+    def get_rate_limiter(self, endpoint='song_download'):
+        """获取指定端点的请求间隔控制器，间隔参数（毫秒）可在对应API配置中设置"""
+        with self.rate_limiters_lock:
+            limiter = self.rate_limiters.get(endpoint)
+            if limiter is None:
+                api_config = self.get_api_config(endpoint)
+                default_interval = self.config['apis']['song_download'].get('request_interval', 1000)
+                interval = api_config.get('request_interval', default_interval)
+                limiter = AdaptiveRateLimiter(
+                    interval=interval / 1000,
+                    min_interval=api_config.get('min_request_interval', min(interval, 100)) / 1000,
+                    max_interval=api_config.get('max_request_interval', interval * 10) / 1000
+                )
+                self.rate_limiters[endpoint] = limiter
+            return limiter
+    
+    def get_circuit_breaker(self, endpoint='song_download'):
+        """获取指定端点的熔断器，阈值可在对应API配置或circuit_breaker中设置"""
+        with self.rate_limiters_lock:
+            breaker = self.circuit_breakers.get(endpoint)
+            if breaker is None:
+                api_config = self.get_api_config(endpoint)
+                default_config = self.config.get('circuit_breaker', {})
+                breaker = CircuitBreaker(
+                    endpoint,
+                    failure_threshold=api_config.get('circuit_failure_threshold', default_config.get('failure_threshold', 5)),
+                    recovery_timeout=api_config.get('circuit_recovery_timeout', default_config.get('recovery_timeout', 30)),
+                    probe_timeout=api_config.get('circuit_probe_timeout', default_config.get('probe_timeout', 5)),
+                    on_state_change=self.notify_circuit_change
+                )
+                self.circuit_breakers[endpoint] = breaker
+            return breaker
+    
+    def add_circuit_listener(self, listener):
+        """注册熔断器状态变化的回调listener(endpoint, old_state, new_state)，可能在任意线程中调用"""
+        self.circuit_listeners.append(listener)
+    
+    def notify_circuit_change(self, endpoint, old_state, new_state):
+        """熔断器状态变化时输出日志并通知所有回调"""
+        print(f"API熔断器状态变化: {endpoint} {old_state} -> {new_state}")
+        for listener in list(self.circuit_listeners):
+            listener(endpoint, old_state, new_state)
+    
+    def get_circuit_states(self):
+        """返回所有已使用端点的熔断器状态"""
+        with self.rate_limiters_lock:
+            return {endpoint: breaker.state for endpoint, breaker in self.circuit_breakers.items()}
+    
+    def parse_retry_after(self, value):
+        """解析Retry-After响应头，返回需要等待的秒数"""
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            pass
+        try:
+            return parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    
+    def request_with_retry(self, url, max_retries=3, endpoint='song_download', headers=None, stream=False):
+        """带重试机制的请求方法，请求间隔根据端点的响应情况自动调整
+        
+        端点的熔断器打开时直接抛出CircuitOpenError；每次失败的尝试（连接错误、超时或5xx）
+        都计为熔断器的一次失败，熔断后不再重试；429限流只由请求间隔控制器处理，不计入熔断器；
+        其他4xx错误说明端点本身可用，不计为失败。
+        半开状态下的探测请求只尝试一次，也不等待请求间隔。
+        stream为True时只读取响应头，响应内容由调用方逐块读取，用完后需关闭响应
+        """
+        limiter = self.get_rate_limiter(endpoint)
+        breaker = self.get_circuit_breaker(endpoint)
+        probe = breaker.before_request()
+        attempts = 1 if probe else max_retries
+        # 一次调用中的多次重试只拉长一次请求间隔
+        throttled = False
         
-        for retry in range(max_retries):
+        for retry in range(attempts):
+            if not probe:
+                # 等待该端点的请求间隔
+                limiter.acquire()
             try:
-                response = requests.get(url, timeout=30)
-                response.raise_for_status()
-                return response
-            except requests.RequestException as e:
-                if retry < max_retries - 1:
-                    time.sleep(request_interval)
+                response = get_session().get(url, timeout=30, headers=headers, stream=stream)
+                if response.status_code in (429, 503):
+                    # 被限流，拉长请求间隔并遵守Retry-After
+                    limiter.on_throttle(self.parse_retry_after(response.headers.get('Retry-After')), backoff=not throttled)
+                    throttled = True
+                try:
+                    response.raise_for_status()
+                except requests.HTTPError:
+                    # 出错的响应不会交给调用方，立即归还连接；stream=True时不关闭会一直占用连接池
+                    response.close()
+                    raise
+            except requests.HTTPError as e:
+                status_code = e.response.status_code if e.response is not None else 0
+                if status_code >= 500:
+                    breaker.on_failure()
+                elif status_code == 429:
+                    breaker.release()
                 else:
-                    raise e
-    
-    def extract_song_id_from_url(self, url):
-        """从URL中提取歌曲ID"""
-        import re
-        # 匹配URL中最后一个&id=或&id=后面的数字
-        match = re.search(r'id=([0-9]+)', url)
-        if match:
-            return match.group(1)
-        # 如果没有找到id参数，尝试匹配最后一个数字串
-        match = re.search(r'([0-9]+)$', url)
-        if match:
-            return match.group(1)
-        # 如果都没有找到，返回空字符串
-        return ''
-    
-    def get_playlist_songs(self, list_id):
-        """获取歌单歌曲列表，支持多个API"""
-        # 获取歌单API列表
-        playlist_apis = self.config['apis']['playlists']
-        
-        # 遍历所有API，直到找到可用的API
+                    breaker.on_success()
+                if retry >= attempts - 1 or breaker.state != breaker.CLOSED:
+                    raise
+            except Exception as e:
+                if isinstance(e, requests.Timeout):
+                    limiter.on_throttle(backoff=not throttled)
+                    throttled = True
+                breaker.on_failure()
+                if retry >= attempts - 1 or breaker.state != breaker.CLOSED or not isinstance(e, requests.RequestException):
+                    raise
+            else:
+                limiter.on_success()
+                breaker.on_success()
+                return response
+    
+    def get_playlist_songs(self, list_id, use_cache=True):
+        """获取歌单歌曲列表（TrackList），支持多个API
+        
+        有磁盘缓存时，API支持ETag/Last-Modified则发起条件请求，内容未变化（304）时直接使用缓存；
+        不支持时在有效期内直接使用缓存。use_cache为False时总是完整请求（结果仍会写入缓存）。
+        需要请求时按统计的延迟和成功率排序API并对冲请求，见race_playlist_apis。
+        只获取到部分歌曲或使用过期缓存时，返回列表的complete为False
+        """
+        # 按历史延迟和成功率排序歌单API
+        playlist_apis = self.playlist_stats.order(self.playlist_profiles)
+        
+        fresh_songs, cached_entries = self.load_playlist_cache(playlist_apis, list_id, use_cache)
+        if fresh_songs is not None:
+            return TrackList(fresh_songs)
+        
+        songs = self.race_playlist_apis(playlist_apis, list_id, cached_entries)
+        if songs:
+            return songs
+        
+        stale_songs = self.get_stale_playlist(playlist_apis, cached_entries)
+        if stale_songs is not None:
+            # 过期的缓存可能已与歌单不一致
+            return TrackList(stale_songs, complete=False)
+        
+        # 所有API都失败
+        raise Exception("所有歌单API都请求失败，请检查网络连接或稍后重试")
+    
+    def iter_playlist_songs(self, list_id, use_cache=True):
+        """逐批返回歌单歌曲（Track列表），响应边接收边解析，调用方不必等整个歌单下载完就可以开始处理前面的歌曲
+        
+        缓存规则与get_playlist_songs相同，可用的缓存整批返回。按统计顺序依次请求歌单API，
+        不进行对冲；某个API开始返回歌曲后不再换用其他API，之后出错时直接抛出异常
+        """
+        playlist_apis = self.playlist_stats.order(self.playlist_profiles)
+        
+        fresh_songs, cached_entries = self.load_playlist_cache(playlist_apis, list_id, use_cache)
+        if fresh_songs is not None:
+            yield fresh_songs
+            return
+        
         for api in playlist_apis:
+            start = time.monotonic()
+            received = False
             try:
-                url = api['request_format'].format(list_id=list_id)
-                response = self.request_with_retry(url)
-                
-                if api['response_type'] == 'json':
-                    data = response.json()
-                    
-                    # 根据API类型处理响应
-                    if api['name'] == 'Injahow歌单API':
-                        # Injahow API直接返回歌曲列表
-                        if isinstance(data, list):
-                            songs = data
-                        else:
-                            print(f"{api['name']}响应不是预期的列表格式: {type(data).__name__}")
-                            continue
-                    else:
-                        # 传统网易云API处理
-                        if isinstance(data, dict):
-                            # 处理不同的API响应结构
-                            if 'result' in data and 'tracks' in data['result']:
-                                # 标准响应格式，包含result.tracks字段
-                                songs = data['result']['tracks']
-                            elif 'tracks' in data:
-                                # 直接包含tracks字段的响应格式
-                                songs = data['tracks']
-                            else:
-                                # 未知响应格式，尝试下一个API
-                                print(f"{api['name']}响应缺少预期的'result.tracks'或'tracks'字段")
-                                continue
-                        else:
-                            print(f"{api['name']}响应不是预期的JSON对象格式")
-                            continue
-                    
-                    # 确保songs是列表
-                    if not isinstance(songs, list):
-                        print(f"{api['name']}获取的歌曲列表不是预期的列表格式")
-                        continue
-                    
-                    result = []
-                    for i, song in enumerate(songs):
-                        try:
-                            # 提取歌曲信息
-                            song_name = song[api['data_paths']['song_name']]
-                            artist = song[api['data_paths']['artist']]
-                            
-                            # 处理歌曲ID，从URL中提取或直接获取
-                            song_id_data = song[api['data_paths']['song_id']]
-                            if isinstance(song_id_data, str) and 'http' in song_id_data:
-                                # 从URL中提取歌曲ID
-                                song_id = self.extract_song_id_from_url(song_id_data)
-                            else:
-                                # 直接使用ID
-                                song_id = str(song_id_data)
-                            
-                            song_info = {
-                                'name': song_name,
-                                'artist': artist,
-                                'id': song_id
-                            }
-                            result.append(song_info)
-                        except Exception as e:
-                            # 记录单首歌曲处理失败，但继续处理其他歌曲
-                            print(f"{api['name']}处理第{i+1}首歌曲失败: {str(e)}")
-                            continue
-                    
-                    # 如果成功获取到歌曲列表，返回结果
-                    if result:
-                        print(f"使用{api['name']}成功获取到{len(result)}首歌曲")
-                        return result
-                    else:
-                        print(f"{api['name']}未获取到有效歌曲列表")
+                for songs in self.stream_playlist_from_api(api, list_id, cached_entries.get(api.name)):
+                    received = True
+                    yield songs
+            except CircuitOpenError as e:
+                # 熔断中的API不发出请求，也不计入统计
+                print(str(e))
+                continue
             except Exception as e:
-                # 记录API请求失败，尝试下一个API
-                print(f"{api['name']}请求失败: {str(e)}")
+                self.playlist_stats.record_failure(api.name)
+                if received:
+                    raise
+                # 记录API请求失败，由下一个API继续
+                print(f"{api.name}请求失败: {str(e)}")
                 continue
+            if received:
+                self.playlist_stats.record_success(api.name, time.monotonic() - start)
+                return
+            self.playlist_stats.record_failure(api.name)
         
-        # 所有API都失败
+        stale_songs = self.get_stale_playlist(playlist_apis, cached_entries)
+        if stale_songs is not None:
+            yield stale_songs
+            return
         raise Exception("所有歌单API都请求失败，请检查网络连接或稍后重试")
     
+    def load_playlist_cache(self, playlist_apis, list_id, use_cache=True):
+        """读取歌单缓存，返回(有效期内可直接使用的歌曲列表或None, 用于条件请求的{API名称: 缓存})"""
+        cached_entries = {}
+        if self.playlist_cache is None or not use_cache:
+            return None, cached_entries
+        for api in playlist_apis:
+            cached = self.playlist_cache.get(api.name, list_id)
+            if cached is None:
+                continue
+            if not (cached.get('etag') or cached.get('last_modified')) and \
+                    cached['age'] < api.config.get('cache_ttl', self.playlist_cache_ttl):
+                print(f"使用{api.name}的缓存，共{len(cached['songs'])}首歌曲")
+                return cached['songs'], cached_entries
+            cached_entries[api.name] = cached
+        return None, cached_entries
+    
+    def get_stale_playlist(self, playlist_apis, cached_entries):
+        """所有API都失败时退回过期的缓存，没有缓存时返回None"""
+        for api in playlist_apis:
+            if api.name in cached_entries:
+                stale_songs = cached_entries[api.name]['songs']
+                print(f"所有歌单API都请求失败，使用{api.name}过期的缓存，共{len(stale_songs)}首歌曲")
+                return stale_songs
+        return None
+    
+    def race_playlist_apis(self, playlist_apis, list_id, cached_entries=None):
+        """对冲请求多个歌单API，返回最先得到的有效歌曲列表，全部失败时返回None
+        
+        先请求排在最前的API，超过playlist_hedge.delay（毫秒）仍未响应时同时请求下一个API，
+        某个API失败时立即请求下一个；落后的请求在后台完成，结果仍会计入统计和缓存
+        """
+        if not playlist_apis:
+            return None
+        cached_entries = cached_entries or {}
+        hedge_delay = self.config.get('playlist_hedge', {}).get('delay', 2000) / 1000
+        results = queue.Queue()
+        
+        def attempt(api):
+            start = time.monotonic()
+            try:
+                songs = self.fetch_playlist_from_api(api, list_id, cached_entries.get(api.name))
+            except CircuitOpenError as e:
+                # 熔断中的API不发出请求，也不计入统计
+                print(str(e))
+                results.put(None)
+                return
+            except Exception as e:
+                # 记录API请求失败，由其他API继续
+                print(f"{api.name}请求失败: {str(e)}")
+                songs = None
+            elapsed = time.monotonic() - start
+            # 先交出结果，统计出错时也不会让等待中的get_playlist_songs卡住
+            results.put(songs)
+            if songs:
+                self.playlist_stats.record_success(api.name, elapsed)
+            else:
+                self.playlist_stats.record_failure(api.name)
+        
+        def launch(index):
+            # 使用守护线程，落后的请求不会阻止程序退出
+            threading.Thread(target=attempt, args=(playlist_apis[index],), daemon=True).start()
+        
+        launch(0)
+        launched = 1
+        pending = 1
+        while pending:
+            try:
+                songs = results.get(timeout=hedge_delay if launched < len(playlist_apis) else None)
+            except queue.Empty:
+                # 当前API在阈值内没有响应，同时请求下一个API
+                print(f"{playlist_apis[launched - 1].name}在{hedge_delay:g}秒内未响应，同时请求{playlist_apis[launched].name}")
+                launch(launched)
+                launched += 1
+                pending += 1
+                continue
+            
+            pending -= 1
+            if songs:
+                return songs
+            if launched < len(playlist_apis):
+                launch(launched)
+                launched += 1
+                pending += 1
+        return None
+    
+    def fetch_playlist_from_api(self, api, list_id, cached=None):
+        """请求单个歌单API并整理为TrackList，响应不可用时返回None，见stream_playlist_from_api"""
+        result = TrackList()
+        stream = self.stream_playlist_from_api(api, list_id, cached)
+        while True:
+            try:
+                result.extend(next(stream))
+            except StopIteration as stop:
+                # 生成器的返回值表示歌曲列表是否完整
+                result.complete = stop.value is not False
+                break
+        return result or None
+    
+    def stream_playlist_from_api(self, api, list_id, cached=None):
+        """请求单个歌单API，用其编译后的配置（PlaylistApiProfile）边接收边解析，逐批返回整理好的歌曲
+        
+        不保存完整的响应内容和JSON对象；cached为该API的缓存时发起条件请求，
+        内容未变化（304）时整批返回缓存的歌曲列表。响应中完整的歌曲ID列表（trackIds）比返回的歌曲多时，
+        配置了song_detail则分批获取其余歌曲的详情，见fetch_song_details。获取详情失败（包括song_detail已熔断）
+        只计入song_detail端点，输出警告后返回已获取的部分歌曲，不算作歌单API失败，也不写入缓存；
+        其他情况全部接收完后写入缓存。生成器的返回值表示返回的歌曲是否为完整的歌单
+        """
+        headers = {}
+        if cached is not None:
+            if cached.get('etag'):
+                headers['If-None-Match'] = cached['etag']
+            if cached.get('last_modified'):
+                headers['If-Modified-Since'] = cached['last_modified']
+        
+        response = self.request_with_retry(api.build_url(list_id), endpoint=api.name, headers=headers, stream=True)
+        with response:
+            if response.status_code == 304 and cached is not None:
+                self.playlist_cache.touch(api.name, list_id)
+                print(f"{api.name}歌单未变化，使用缓存的{len(cached['songs'])}首歌曲")
+                yield cached['songs']
+                return
+            
+            result = []
+            track_ids = []
+            for songs in api.iter_songs(response.iter_content(chunk_size=PLAYLIST_CHUNK_SIZE), track_ids):
+                result.extend(songs)
+                yield songs
+        
+        complete = True
+        if len(track_ids) > len(result) and self.song_detail_profile is None:
+            complete = False
+            print(f"警告: {api.name}只返回了{len(result)}/{len(track_ids)}首歌曲，未配置apis.song_detail，无法获取其余歌曲")
+        elif len(track_ids) > len(result):
+            # 歌单API只返回了第一页歌曲，其余歌曲按ID批量获取
+            received = {song.id for song in result}
+            missing = [song_id for song_id in dict.fromkeys(track_ids) if song_id not in received]
+            print(f"{api.name}返回了{len(result)}/{len(track_ids)}首歌曲，分批获取其余{len(missing)}首歌曲的详情")
+            try:
+                for songs in self.fetch_song_details(missing):
+                    result.extend(songs)
+                    yield songs
+            except Exception as e:
+                # 失败已由request_with_retry计入song_detail端点的熔断器，歌单API本身是正常的
+                complete = False
+                print(f"警告: 获取歌曲详情失败，只使用已获取的{len(result)}/{len(track_ids)}首歌曲: {str(e)}")
+        
+        if not result:
+            print(f"{api.name}未获取到有效歌曲列表")
+            return complete
+        print(f"使用{api.name}成功获取到{len(result)}首歌曲")
+        if self.playlist_cache is not None and complete:
+            self.playlist_cache.set(api.name, list_id, result,
+                                    response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        return complete
+    
+    def fetch_song_details(self, song_ids):
+        """通过歌曲详情API按ID获取歌曲，逐批返回Track列表，顺序与song_ids一致
+        
+        每批最多song_detail.batch_size个ID，同时进行song_detail.concurrency个请求，
+        请求间隔和熔断与其他端点一样按song_detail单独控制
+        """
+        profile = self.song_detail_profile
+        if profile is None or not song_ids:
+            return
+        batches = [song_ids[i:i + profile.batch_size] for i in range(0, len(song_ids), profile.batch_size)]
+        executor = ThreadPoolExecutor(max_workers=min(profile.concurrency, len(batches)))
+        try:
+            # map按提交顺序返回结果，后面的批次在等待前面的批次时已经在请求
+            for songs in executor.map(self.fetch_song_detail_batch, batches):
+                yield songs
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    def fetch_song_detail_batch(self, song_ids):
+        """请求一批歌曲的详情，返回按song_ids排序的Track列表，API没有返回的歌曲会被跳过"""
+        profile = self.song_detail_profile
+        response = self.request_with_retry(profile.build_url(song_ids), endpoint='song_detail')
+        songs = profile.find_songs(response.json())
+        if songs is None:
+            raise ValueError("歌曲详情API响应中没有找到歌曲列表")
+        positions = {song_id: position for position, song_id in enumerate(song_ids)}
+        result = [song for song in profile.normalize(songs) if song.id in positions]
+        result.sort(key=lambda song: positions[song.id])
+        if len(result) < len(song_ids):
+            print(f"歌曲详情API只返回了{len(result)}/{len(song_ids)}首歌曲")
+        return result
+    
     def get_song_download_url(self, song_id, quality=None):
         """获取歌曲下载链接"""
-        download_api = self.config['apis']['song_download']
+        return self.get_song_download_info(song_id, quality).get('url', '')
+    
+    def get_song_download_info(self, song_id, quality=None):
+        """获取歌曲下载信息{'url': 下载链接, 'md5': API提供的MD5或None}
         
+        结果按(歌曲ID, 音质)缓存，并发请求同一首歌时只发出一次请求
+        """
+        if quality is None:
+            quality = self.get_default_quality()
+        
+        def load():
+            info = self.fetch_song_download_info(song_id, quality)
+            # 没有获取到链接时不缓存
+            return info if info['url'] else None
+        
+        return self.url_cache.get_or_load((str(song_id), quality), load) or {'url': '', 'md5': None}
+    
+    def invalidate_song_download_url(self, song_id, quality=None):
+        """移除缓存的下载链接，链接失效（如下载失败）时调用"""
         if quality is None:
-            quality = download_api['default_quality']
+            quality = self.get_default_quality()
+        self.url_cache.invalidate((str(song_id), quality))
+    
+    def fetch_song_download_info(self, song_id, quality):
+        """请求API获取歌曲下载链接和MD5（不经过缓存）
+        
+        JSON响应中的MD5字段路径由song_download.md5_path配置，未配置或提取失败时为None
+        """
+        download_api = self.config['apis']['song_download']
         
         url = download_api['request_format'].format(song_id=song_id, quality=quality)
         
-        response = self.request_with_retry(url)
+        response = self.request_with_retry(url, endpoint='song_download')
         
         if download_api['response_type'] == 'text':
-            return response.text.strip()
+            return {'url': response.text.strip(), 'md5': None}
         elif download_api['response_type'] == 'json':
             data = response.json()
+            md5 = None
+            if download_api.get('md5_path'):
+                try:
+                    md5 = str(self.extract_data(data, download_api['md5_path'])).strip().lower() or None
+                except KeyError:
+                    pass
             # 根据实际API响应结构调整
-            return data.get('url', '')
+            return {'url': data.get('url', ''), 'md5': md5}
         else:
             raise ValueError(f"Unsupported response type: {download_api['response_type']}")
     
@@ -161,34 +492,23 @@ class APIHandler:
     def set_request_interval(self, interval):
         """设置API请求间隔（毫秒）"""
         self.config['apis']['song_download']['request_interval'] = interval
+        # 以新的间隔作为自适应调整的起点
+        self.get_rate_limiter('song_download').set_interval(interval / 1000)
         # 保存配置到文件
         with open('config.json', 'w', encoding='utf-8') as f:
             json.dump(self.config, f, ensure_ascii=False, indent=2)
     
     def extract_data(self, data, path):
-        """从嵌套数据中提取指定路径的值，添加错误处理"""
-        keys = path.split('.')
-        result = data
-        
-        for i, key in enumerate(keys):
-            try:
-                # 处理列表索引，如 artists[0]
-                if '[' in key and ']' in key:
-                    list_key, index = key.split('[')
-                    index = int(index[:-1])
-                    result = result[list_key][index]
-                else:
-                    result = result[key]
-            except (KeyError, IndexError, TypeError) as e:
-                # 详细的错误信息，包括当前路径和数据结构
-                error_path = '.'.join(keys[:i+1])
-                raise KeyError(f"无法从路径 '{error_path}' 提取数据。\n"\
-                             f"当前数据结构: {str(result)}\n"\
-                             f"完整路径: {path}\n"\
-                             f"错误类型: {type(e).__name__}\n"\
-                             f"错误信息: {str(e)}") from e
-        
-        return result
+        """从嵌套数据中提取指定路径的值，路径编译后缓存，添加错误处理"""
+        try:
+            return compile_path(path)(data)
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            # 详细的错误信息，包括数据结构和完整路径
+            raise KeyError(f"无法从路径 '{path}' 提取数据。\n"\
+                         f"当前数据结构: {str(data)}\n"\
+                         f"完整路径: {path}\n"\
+                         f"错误类型: {type(e).__name__}\n"\
+                         f"错误信息: {str(e)}") from e
     
     def get_quality_options(self):
         """获取支持的音质选项"""
@@ -0,0 +1,85 @@
+import json
+import os
+import threading
+import time
+
+class EndpointStats:
+    """各API端点的响应延迟和成功率统计（指数加权移动平均）
+
+    统计结果保存在JSON文件中，程序重启后仍按上次的统计优先使用最快且可用的API；
+    path为None时只在内存中统计
+    """
+    def __init__(self, path=None, alpha=0.3):
+        self.path = path
+        self.alpha = alpha
+        self.lock = threading.Lock()
+        self.stats = {}
+        if path:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.stats = json.load(f)
+            except (OSError, ValueError):
+                self.stats = {}
+
+    def record_success(self, name, latency):
+        """记录一次成功请求及其耗时（秒）"""
+        with self.lock:
+            entry = self.stats.setdefault(name, {'latency': latency, 'success_rate': 1.0, 'successes': 0, 'failures': 0})
+            if entry['latency'] is None:
+                # 之前只有失败记录
+                entry['latency'] = latency
+            entry['latency'] += self.alpha * (latency - entry['latency'])
+            entry['success_rate'] += self.alpha * (1.0 - entry['success_rate'])
+            entry['successes'] += 1
+            entry['updated_at'] = time.time()
+            self.save()
+
+    def record_failure(self, name):
+        """记录一次失败请求"""
+        with self.lock:
+            entry = self.stats.setdefault(name, {'latency': None, 'success_rate': 1.0, 'successes': 0, 'failures': 0})
+            entry['success_rate'] -= self.alpha * entry['success_rate']
+            entry['failures'] += 1
+            entry['updated_at'] = time.time()
+            self.save()
+
+    def score(self, name, prior=0.0):
+        """预期的有效响应时间，越小越优先；没有统计记录的端点返回prior，只有失败记录的端点排在最后"""
+        entry = self.stats.get(name)
+        if entry is None or entry.get('latency') is None:
+            return prior if entry is None else float('inf')
+        return entry['latency'] / max(entry['success_rate'], 0.01)
+
+    def prior(self, names):
+        """names中有成功记录的端点得分的中位数，作为新端点的中性得分，既不抢在已知较快的端点之前，
+        也不会一直排在最后；都没有成功记录时为0
+        """
+        scores = sorted(score for score in (self.score(name) for name in names if name in self.stats)
+                        if score != float('inf'))
+        if not scores:
+            return 0.0
+        middle = len(scores) // 2
+        return scores[middle] if len(scores) % 2 else (scores[middle - 1] + scores[middle]) / 2
+
+    def order(self, apis):
+        """按统计结果排序API（带name属性，如PlaylistApiProfile），得分相同时保持配置中的顺序"""
+        with self.lock:
+            prior = self.prior([api.name for api in apis])
+            return sorted(apis, key=lambda api: self.score(api.name, prior))
+
+    def snapshot(self):
+        """返回所有端点统计的副本"""
+        with self.lock:
+            return {name: dict(entry) for name, entry in self.stats.items()}
+
+    def save(self):
+        """写入文件，调用时需持有self.lock，写入失败时忽略"""
+        if not self.path:
+            return
+        temp_path = self.path + '.tmp'
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.stats, f, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"Failed to save API stats: {str(e)}")
@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+from utils.track import Track
+
+class TTLCache:
+    """带过期时间的线程安全内存缓存
+
+    同一个键同时被多个线程请求时只执行一次加载，其他线程等待并共享这次加载的结果
+    """
+    def __init__(self, ttl=600, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        # key -> (value, 过期时间)
+        self.entries = {}
+        # 正在加载中的键，key -> Future
+        self.loading = {}
+
+    def get(self, key):
+        """获取未过期的缓存值，不存在时返回None"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                return entry[0]
+            return None
+
+    def get_or_load(self, key, loader):
+        """获取缓存值，未命中时调用loader()加载；值为空时不缓存"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                return entry[0]
+
+            future = self.loading.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self.loading[key] = future
+
+        if not is_owner:
+            # 其他线程正在加载同一个键，等待其结果
+            return future.result()
+
+        try:
+            value = loader()
+        except BaseException as e:
+            with self.lock:
+                del self.loading[key]
+            future.set_exception(e)
+            raise
+
+        with self.lock:
+            if value and self.ttl > 0:
+                if len(self.entries) >= self.max_entries:
+                    self.prune()
+                self.entries[key] = (value, time.monotonic() + self.ttl)
+            del self.loading[key]
+        future.set_result(value)
+        return value
+
+    def invalidate(self, key):
+        """移除指定键的缓存"""
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        """清空缓存"""
+        with self.lock:
+            self.entries.clear()
+
+    def prune(self):
+        """清理过期条目，仍然过多时丢弃最早过期的一半，调用方需持有锁"""
+        now = time.monotonic()
+        self.entries = {key: entry for key, entry in self.entries.items() if entry[1] > now}
+        if len(self.entries) >= self.max_entries:
+            keep = sorted(self.entries.items(), key=lambda item: item[1][1])[len(self.entries) // 2:]
+            self.entries = dict(keep)
+
+
+class PlaylistCache:
+    """歌单歌曲列表的磁盘缓存，按(歌单API, 歌单ID)保存整理后的歌曲列表
+
+    同时保存响应的ETag和Last-Modified，用于下次请求时向API发起条件请求；
+    文件的修改时间即最近一次确认内容有效的时间
+    """
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def entry_path(self, api_name, list_id):
+        """(歌单API, 歌单ID)对应的缓存文件路径"""
+        digest = hashlib.sha1(f"{api_name}\0{list_id}".encode('utf-8')).hexdigest()
+        return os.path.join(self.root, f"{digest}.json")
+
+    def get(self, api_name, list_id):
+        """读取缓存，返回包含songs（Track列表）、etag、last_modified、age（距上次确认有效的秒数）的字典，
+        不存在或无法解析时返回None
+        """
+        path = self.entry_path(api_name, list_id)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            entry['age'] = time.time() - os.path.getmtime(path)
+            entry['songs'] = [Track.from_dict(song) for song in entry['songs']]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        return entry
+
+    def set(self, api_name, list_id, songs, etag=None, last_modified=None):
+        """保存歌曲列表（Track列表），写入失败时忽略"""
+        path = self.entry_path(api_name, list_id)
+        entry = {
+            'api': api_name,
+            'list_id': str(list_id),
+            'etag': etag,
+            'last_modified': last_modified,
+            'songs': [song.to_dict() for song in songs]
+        }
+        # 先写临时文件再替换，并发写入同一歌单时不会读到不完整的文件
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Failed to save playlist cache: {str(e)}")
+
+    def touch(self, api_name, list_id):
+        """API确认内容未变化（304）时更新确认时间，无需重写歌曲列表"""
+        try:
+            os.utime(self.entry_path(api_name, list_id))
+        except OSError:
+            pass
+
+    def invalidate(self, api_name, list_id):
+        """删除指定歌单的缓存"""
+        try:
+            os.remove(self.entry_path(api_name, list_id))
+        except OSError:
+            pass
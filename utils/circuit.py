@@ -0,0 +1,96 @@
+import threading
+import time
+
+class CircuitOpenError(Exception):
+    """端点的熔断器处于打开状态，请求被直接拒绝"""
+    def __init__(self, name, retry_after):
+        super().__init__(f"{name}暂时不可用（连续失败后已熔断），{retry_after:.0f}秒后重试")
+        self.name = name
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """单个API端点的熔断器
+
+    closed:    正常请求，连续失败达到failure_threshold次后打开
+    open:      直接拒绝请求（抛出CircuitOpenError），recovery_timeout秒后进入半开状态
+    half_open: 只放行一个探测请求，成功则关闭，失败则重新打开；探测期间其他请求最多等待probe_timeout秒，
+               超时仍没有结果时抛出CircuitOpenError
+
+    状态变化时调用on_state_change(name, old_state, new_state)
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, failure_threshold=5, recovery_timeout=30, probe_timeout=5, on_state_change=None):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.recovery_timeout = recovery_timeout
+        self.probe_timeout = probe_timeout
+        self.on_state_change = on_state_change
+        self.lock = threading.Lock()
+        # 半开状态下等待探测结果
+        self.probe_done = threading.Condition(self.lock)
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+
+    def before_request(self):
+        """请求前调用，熔断器打开时抛出CircuitOpenError；本次请求是半开状态下的探测请求时返回True"""
+        with self.lock:
+            deadline = None
+            while True:
+                if self.state == self.CLOSED:
+                    return False
+                remaining = self.opened_at + self.recovery_timeout - time.monotonic()
+                if self.state == self.OPEN and remaining <= 0:
+                    # 冷却结束，放行一个探测请求
+                    self.set_state(self.HALF_OPEN)
+                if self.state != self.HALF_OPEN:
+                    raise CircuitOpenError(self.name, remaining)
+                if not self.probing:
+                    self.probing = True
+                    return True
+                # 其他线程正在探测，等待结果后重新判断，超时后不再等待
+                if deadline is None:
+                    deadline = time.monotonic() + self.probe_timeout
+                wait = deadline - time.monotonic()
+                if wait <= 0:
+                    raise CircuitOpenError(self.name, self.probe_timeout)
+                self.probe_done.wait(wait)
+
+    def on_success(self):
+        """请求成功后调用"""
+        with self.lock:
+            self.failures = 0
+            self.probing = False
+            if self.state != self.CLOSED:
+                self.set_state(self.CLOSED)
+            self.probe_done.notify_all()
+
+    def on_failure(self):
+        """请求失败后调用"""
+        with self.lock:
+            self.failures += 1
+            self.probing = False
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+                self.opened_at = time.monotonic()
+                self.set_state(self.OPEN)
+            self.probe_done.notify_all()
+
+    def release(self):
+        """请求结束但结果不能说明端点是否可用（如被限流）时调用，不改变状态，只让出探测机会"""
+        with self.lock:
+            self.probing = False
+            self.probe_done.notify_all()
+
+    def set_state(self, state):
+        """切换状态并通知，调用时需持有self.lock"""
+        old_state = self.state
+        self.state = state
+        if self.on_state_change is not None:
+            try:
+                self.on_state_change(self.name, old_state, state)
+            except Exception as e:
+                print(f"Circuit breaker listener failed: {str(e)}")
@@ -0,0 +1,309 @@
+import argparse
+import contextlib
+import json
+import signal
+import sys
+import threading
+import time
+from utils.api import APIHandler
+from utils.downloader import SongDownloader
+from utils.pipeline import DownloadPipeline
+from utils.sync import PlaylistSyncer
+from utils.jobqueue import JobQueue, JobRunner
+
+class Reporter:
+    """命令行输出：默认输出便于阅读的文本，--json时每行输出一个JSON事件
+
+    JSON模式下库代码的print输出会被重定向到stderr，保证stdout中只有JSON
+    """
+    def __init__(self, as_json=False):
+        self.as_json = as_json
+        self.stdout = sys.stdout
+
+    def event(self, event, text=None, **fields):
+        """输出一个事件，text为文本模式下显示的内容，为None时文本模式不输出"""
+        if self.as_json:
+            fields['event'] = event
+            self.stdout.write(json.dumps(fields, ensure_ascii=False) + '\n')
+            self.stdout.flush()
+        elif text is not None:
+            self.stdout.write(text + '\n')
+            self.stdout.flush()
+
+    def log(self, message):
+        """输出日志信息"""
+        self.event('log', message, message=message)
+
+    def song_callback(self, total, counts):
+        """创建流水线的单首歌曲完成回调，同时统计成功、跳过和失败数
+
+        total为None时歌曲仍在陆续到达，显示counts['total']（已收到的歌曲数）
+        """
+        def callback(index, song, success, message):
+            counts['done'] += 1
+            status = classify(success, message)
+            counts[status] += 1
+            self.event(
+                'song', f"[{counts['done']}/{total if total is not None else counts['total']}] {status_text(status)}: {song.artist} - {song.name}: {message}",
+                index=index, id=str(song.id), name=song.name, artist=song.artist, status=status, message=message
+            )
+        return callback
+
+def classify(success, message):
+    """根据下载结果返回success、skip或fail"""
+    if not success:
+        return 'fail'
+    return 'skip' if "已跳过" in message else 'success'
+
+def status_text(status):
+    """下载状态的中文说明"""
+    return {'success': "下载成功", 'skip': "已跳过", 'fail': "下载失败"}[status]
+
+def create_stop_flag():
+    """收到Ctrl+C或SIGTERM后不再开始新的歌曲，已开始的歌曲会继续完成；再次按Ctrl+C立即退出"""
+    stop = threading.Event()
+
+    def handler(signum, frame):
+        if stop.is_set():
+            raise KeyboardInterrupt
+        stop.set()
+        print("正在停止，等待进行中的歌曲完成，再次按Ctrl+C立即退出", file=sys.stderr)
+
+    signal.signal(signal.SIGINT, handler)
+    if hasattr(signal, 'SIGTERM'):
+        signal.signal(signal.SIGTERM, handler)
+    return stop
+
+def create_api_handler(args, reporter):
+    """创建APIHandler，熔断器状态变化时输出circuit事件"""
+    api_handler = APIHandler(args.config)
+    api_handler.add_circuit_listener(lambda endpoint, old_state, new_state: reporter.event(
+        'circuit', f"API熔断器: {endpoint} {old_state} -> {new_state}",
+        endpoint=endpoint, old_state=old_state, new_state=new_state
+    ))
+    return api_handler
+
+def apply_transfer_options(downloader, args):
+    """将命令行的下载选项应用到SongDownloader"""
+    if args.segmented:
+        downloader.segment_enabled = True
+    return (
+        args.workers or downloader.max_workers,
+        args.resolve_workers or downloader.resolve_workers
+    )
+
+def summary(reporter, counts, started, **fields):
+    """输出统计结果，返回进程退出码"""
+    elapsed = time.monotonic() - started
+    reporter.event(
+        'summary',
+        f"完成! 成功: {counts['success']}, 跳过: {counts['skip']}, 失败: {counts['fail']}, "
+        f"总计: {counts['total']}, 用时: {elapsed:.1f}秒",
+        success=counts['success'], skip=counts['skip'], fail=counts['fail'], total=counts['total'],
+        elapsed=round(elapsed, 3), **fields
+    )
+    return 1 if counts['fail'] else 0
+
+def command_download(args, reporter):
+    """下载整个歌单"""
+    api_handler = create_api_handler(args, reporter)
+    downloader = SongDownloader(api_handler)
+    max_workers, resolve_workers = apply_transfer_options(downloader, args)
+    quality = args.quality or api_handler.get_default_quality()
+    stop = create_stop_flag()
+    started = time.monotonic()
+
+    reporter.log(f"正在获取歌单 {args.playlist_id} 的歌曲列表...")
+    counts = {'success': 0, 'skip': 0, 'fail': 0, 'done': 0, 'total': 0}
+
+    def songs():
+        # 歌单边接收边解析，先到的歌曲立即开始下载，歌单接收完后输出playlist事件
+        for batch in api_handler.iter_playlist_songs(args.playlist_id):
+            counts['total'] += len(batch)
+            yield from batch
+        reporter.event('playlist', f"获取到 {counts['total']} 首歌曲", playlist_id=args.playlist_id, total=counts['total'])
+
+    pipeline = DownloadPipeline(downloader, resolve_workers, max_workers)
+    pipeline.run(songs(), args.output, quality, args.speed_limit, args.skip_existing, args.filename_format,
+                 callback=reporter.song_callback(None, counts), should_stop=stop.is_set)
+    return summary(reporter, counts, started, stopped=stop.is_set())
+
+def command_sync(args, reporter):
+    """增量同步歌单"""
+    api_handler = create_api_handler(args, reporter)
+    downloader = SongDownloader(api_handler)
+    max_workers, resolve_workers = apply_transfer_options(downloader, args)
+    syncer = PlaylistSyncer(downloader)
+    stop = create_stop_flag()
+    started = time.monotonic()
+
+    reporter.log(f"正在获取歌单 {args.playlist_id} 的歌曲列表...")
+    plan = syncer.plan(args.playlist_id, args.output, args.quality)
+    songs = plan['pending']
+    reporter.event(
+        'plan',
+        f"增量同步: 新增 {len(plan['added'])} 首, 移除 {len(plan['removed'])} 首, "
+        f"未变化 {plan['unchanged']} 首, 待下载 {len(songs)} 首",
+        playlist_id=args.playlist_id, added=plan['added'], removed=plan['removed'],
+        unchanged=plan['unchanged'], pending=len(songs)
+    )
+
+    counts = {'success': 0, 'skip': 0, 'fail': 0, 'done': 0, 'total': len(songs)}
+    syncer.apply(plan, args.speed_limit, args.filename_format, args.removed, max_workers, resolve_workers,
+                 callback=reporter.song_callback(len(songs), counts), should_stop=stop.is_set)
+    code = summary(reporter, counts, started, stopped=stop.is_set())
+    if not plan['complete']:
+        # 歌单不完整时没有处理移除的歌曲，也没有更新快照，需要稍后重新同步
+        reporter.log("歌单不完整，未处理移除的歌曲，请稍后重新同步")
+        return code or 1
+    return code
+
+def command_convert(args, reporter):
+    """批量转换NCM文件"""
+    from utils.ncm_converter import NCMConverter
+    started = time.monotonic()
+    converter = NCMConverter(args.ncmdump)
+    results = converter.batch_convert(args.input, args.output)
+
+    counts = {'success': 0, 'skip': 0, 'fail': 0, 'total': 0}
+    for ncm_file, success, message in results:
+        if ncm_file is None:
+            # 目录中没有NCM文件
+            reporter.log(message)
+            continue
+        counts['total'] += 1
+        counts['success' if success else 'fail'] += 1
+        reporter.event(
+            'file', f"{'转换成功' if success else '转换失败'}: {ncm_file}: {message}",
+            file=ncm_file, success=success, message=message
+        )
+    return summary(reporter, counts, started)
+
+def command_queue(args, reporter):
+    """管理和运行任务队列"""
+    api_handler = create_api_handler(args, reporter)
+    queue = JobQueue(api_handler.config.get('download', {}).get('queue_path', 'jobs.db'))
+    try:
+        if args.queue_command == 'add':
+            quality = args.quality or api_handler.get_default_quality()
+            job_id = queue.add_job(args.playlist_id, args.output, quality, args.filename_format,
+                                   args.skip_existing, args.priority)
+            reporter.event('job', f"歌单 {args.playlist_id} 已加入任务队列（任务{job_id}，优先级 {args.priority}）",
+                           id=job_id, playlist_id=args.playlist_id, priority=args.priority)
+            return 0
+
+        if args.queue_command == 'list':
+            for job in queue.list_jobs():
+                reporter.event(
+                    'job',
+                    f"任务{job['id']}: 歌单 {job['playlist_id']} -> {job['save_path']} [{job['status']}] "
+                    f"优先级 {job['priority']}, 已完成 {job['completed'] or 0}/{job['total']}, 失败 {job['failed'] or 0}",
+                    **job
+                )
+            return 0
+
+        if args.queue_command == 'clear':
+            queue.clear_finished()
+            reporter.log("已清除所有已完成的任务")
+            return 0
+
+        # run
+        downloader = SongDownloader(api_handler)
+        max_workers, resolve_workers = apply_transfer_options(downloader, args)
+        stop = create_stop_flag()
+        started = time.monotonic()
+
+        def on_song_done(done, total, job, song, success, message):
+            status = classify(success, message)
+            reporter.event(
+                'song', f"[{done}/{total}] 任务{job['id']} {status_text(status)}: {song.artist} - {song.name}: {message}",
+                job_id=job['id'], id=str(song.id), name=song.name, artist=song.artist, status=status, message=message
+            )
+
+        counts = JobRunner(downloader, queue).run(args.speed_limit, max_workers, resolve_workers,
+                                                  callback=on_song_done, should_stop=stop.is_set, log=reporter.log)
+        return summary(reporter, counts, started, stopped=stop.is_set())
+    finally:
+        queue.close()
+
+def add_transfer_arguments(parser):
+    """添加下载相关的公共参数"""
+    parser.add_argument('--speed-limit', type=int, default=0, help="总下载速度上限（KiB/s），0表示不限速")
+    parser.add_argument('-j', '--workers', type=positive_int, help="并发下载数")
+    parser.add_argument('--resolve-workers', type=positive_int, help="解析下载链接的并发数")
+    parser.add_argument('--segmented', action='store_true', help="大文件分段并行下载")
+
+def add_output_arguments(parser):
+    """添加保存路径、音质和文件名相关的公共参数"""
+    parser.add_argument('-o', '--output', default='./downloads', help="保存路径（默认./downloads）")
+    parser.add_argument('-q', '--quality', help="音质，默认使用配置中的default_quality")
+    parser.add_argument('--filename-format', type=int, choices=[0, 1], default=0,
+                        help="文件名格式: 0为「歌名 - 作者」，1为「作者 - 歌名」")
+
+def positive_int(value):
+    """大于0的整数参数"""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError("必须是大于0的整数")
+    return number
+
+def build_parser():
+    """构建命令行参数解析器"""
+    parser = argparse.ArgumentParser(prog='main.py', description="网易云音乐歌单下载器（命令行模式）")
+    parser.add_argument('--config', default='config.json', help="配置文件路径（默认config.json）")
+    parser.add_argument('--json', action='store_true', help="每行输出一个JSON事件，便于脚本处理")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    download_parser = subparsers.add_parser('download', help="下载歌单")
+    download_parser.add_argument('playlist_id', help="歌单ID")
+    add_output_arguments(download_parser)
+    add_transfer_arguments(download_parser)
+    download_parser.add_argument('--skip-existing', action='store_true', help="跳过已下载的歌曲")
+    download_parser.set_defaults(handler=command_download)
+
+    sync_parser = subparsers.add_parser('sync', help="增量同步歌单，只下载新增的歌曲")
+    sync_parser.add_argument('playlist_id', help="歌单ID")
+    add_output_arguments(sync_parser)
+    add_transfer_arguments(sync_parser)
+    sync_parser.add_argument('--removed', choices=PlaylistSyncer.REMOVED_ACTIONS, default='keep',
+                             help="已从歌单中移除的歌曲: keep保留，delete删除，archive移动到_archive文件夹")
+    sync_parser.set_defaults(handler=command_sync)
+
+    convert_parser = subparsers.add_parser('convert', help="批量转换NCM文件")
+    convert_parser.add_argument('input', help="NCM文件所在目录")
+    convert_parser.add_argument('-o', '--output', help="输出目录，默认与输入目录相同")
+    convert_parser.add_argument('--ncmdump', help="ncmdump可执行文件路径，默认自动查找")
+    convert_parser.set_defaults(handler=command_convert)
+
+    queue_parser = subparsers.add_parser('queue', help="管理和运行任务队列")
+    queue_subparsers = queue_parser.add_subparsers(dest='queue_command', required=True)
+    queue_add_parser = queue_subparsers.add_parser('add', help="将歌单加入任务队列")
+    queue_add_parser.add_argument('playlist_id', help="歌单ID")
+    add_output_arguments(queue_add_parser)
+    queue_add_parser.add_argument('--priority', type=int, default=0, help="优先级，数值越大越先执行")
+    queue_add_parser.add_argument('--no-skip-existing', dest='skip_existing', action='store_false',
+                                  help="不跳过已下载的歌曲")
+    queue_subparsers.add_parser('list', help="列出所有任务")
+    queue_subparsers.add_parser('clear', help="清除已完成的任务")
+    queue_run_parser = queue_subparsers.add_parser('run', help="运行所有未完成的任务")
+    add_transfer_arguments(queue_run_parser)
+    queue_parser.set_defaults(handler=command_queue)
+
+    return parser
+
+def main(argv=None):
+    """命令行入口，返回进程退出码：0为全部成功，1为有失败"""
+    args = build_parser().parse_args(argv)
+    reporter = Reporter(args.json)
+
+    # JSON模式下stdout只输出事件，其他打印信息转到stderr
+    redirect = contextlib.redirect_stdout(sys.stderr) if args.json else contextlib.nullcontext()
+    with redirect:
+        try:
+            return args.handler(args, reporter)
+        except KeyboardInterrupt:
+            reporter.event('error', "已中断", message="interrupted")
+            return 130
+        except Exception as e:
+            reporter.event('error', f"错误: {str(e)}", message=str(e))
+            return 1
@@ -1,92 +1,560 @@
 import requests
+import hashlib
+import json
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from utils.session import get_session
+from utils.ratelimit import bandwidth_limiter
+from utils.prefetch import UrlPrefetcher
+from utils.store import ContentStore
+from utils.manifest import DownloadManifest
+from utils.prealloc import preallocate
+from utils.circuit import CircuitOpenError
 
 class SongDownloader:
     def __init__(self, api_handler):
         self.api_handler = api_handler
-        # 获取API请求间隔（毫秒）
-        self.request_interval = self.api_handler.config['apis']['song_download'].get('request_interval', 1000) / 1000  # 转换为秒
-        self.last_request_time = 0
+        # 默认并发下载数
+        self.max_workers = self.api_handler.config.get('download', {}).get('max_workers', 4)
+        # 流水线模式下解析下载链接的并发数
+        self.resolve_workers = self.api_handler.config.get('download', {}).get('resolve_workers', 2)
+        # 预取之后几首歌曲的下载链接，0表示不预取
+        self.prefetch_count = self.api_handler.config.get('download', {}).get('prefetch', 3)
+        # 大文件分段并行下载配置
+        segmented_config = self.api_handler.config.get('download', {}).get('segmented', {})
+        self.segment_enabled = segmented_config.get('enabled', False)
+        self.segment_qualities = segmented_config.get('qualities', ['lossless', 'hire'])
+        self.segment_count = segmented_config.get('segment_count', 4)
+        self.segment_size = segmented_config.get('segment_size', 8 * 1024 * 1024)  # 每段最小字节数
+        # 预分配方式分段下载后是否重新读取整个文件校验API提供的MD5
+        self.segment_verify = segmented_config.get('verify', True)
+        # 传输缓冲区大小（字节），每个缓冲区只做一次写入和限速检查
+        self.buffer_size = self.api_handler.config.get('download', {}).get('buffer_size', 256 * 1024)
+        # 已知文件大小时预分配磁盘空间，分段下载直接写入同一文件的不同位置
+        self.preallocate = self.api_handler.config.get('download', {}).get('preallocate', False)
+        # 内容去重仓库，配置download.store_path后启用
+        store_path = self.api_handler.config.get('download', {}).get('store_path')
+        self.store = ContentStore(store_path) if store_path else None
+        # 已完成下载的清单，跳过已下载歌曲时以清单为准，download.manifest_path设为空时不使用
+        manifest_path = self.api_handler.config.get('download', {}).get('manifest_path', 'manifest.db')
+        self.manifest = DownloadManifest(manifest_path) if manifest_path else None
+        # 失败重试次数和重试间隔（秒）
+        self.max_retries = 3
+        self.retry_delay = 3
     
-    def download_song(self, song_info, save_path, quality=None, speed_limit=0, skip_existing=False, filename_format=0):
-        """下载单个歌曲，支持失败重试、跳过已存在文件和自定义文件名格式"""
-        max_retries = 3
-        retry_delay = 3  # 秒
+    def download_song(self, song_info, save_path, quality=None, speed_limit=None, skip_existing=False, filename_format=0):
+        """下载单个歌曲，支持失败重试、跳过已存在文件和自定义文件名格式
         
-        # 根据格式构建文件名
-        if filename_format == 0:
-            # 歌名 - 作者
-            filename = f"{song_info['name']} - {song_info['artist']}.mp3"
-        else:
-            # 作者 - 歌名
-            filename = f"{song_info['artist']} - {song_info['name']}.mp3"
-        # 替换非法字符
-        filename = self.sanitize_filename(filename)
-        filepath = os.path.join(save_path, filename)
+        speed_limit不为None时设置全局总下载速度（KiB/s，0表示不限速）
+        """
+        if speed_limit is not None:
+            self.set_speed_limit(speed_limit)
         
-        # 检查文件是否已存在，如果是则跳过
-        if skip_existing and os.path.exists(filepath):
-            return True, f"已跳过: {filename}（文件已存在）"
+        max_retries = self.max_retries
+        retry_delay = self.retry_delay
+        
+        filepath = self.build_filepath(song_info, save_path, filename_format)
+        
+        # 检查歌曲是否已下载，如果是则跳过
+        if skip_existing:
+            skip_message = self.check_downloaded(song_info, quality, save_path, filepath)
+            if skip_message:
+                return True, skip_message
         
         # 确保保存目录存在
         os.makedirs(save_path, exist_ok=True)
         
+        # 其他歌单已下载过同一首歌时直接从仓库链接
+        if self.reuse_from_store(song_info, quality, filepath):
+            return True, f"已链接: {filepath}（复用已下载的文件）"
+        
         for attempt in range(max_retries):
             try:
-                # 控制API请求间隔
-                current_time = time.time()
-                elapsed = current_time - self.last_request_time
-                if elapsed < self.request_interval:
-                    time.sleep(self.request_interval - elapsed)
-                
                 # 获取下载链接
-                download_url = self.api_handler.get_song_download_url(song_info['id'], quality)
-                self.last_request_time = time.time()
-                
-                if not download_url:
-                    raise ValueError(f"Failed to get download URL for song: {song_info['name']}")
+                download_info = self.resolve_download_info(song_info, quality)
                 
-                # 下载歌曲
-                self.download_file(download_url, filepath, speed_limit)
+                # 下载歌曲，校验通过后才会出现在filepath
+                digest = self.download_file(download_info['url'], filepath, self.use_segmented(quality),
+                                            download_info.get('md5'))
+                self.record_download(song_info, quality, filepath, digest)
                 
                 return True, filepath
+            except CircuitOpenError as e:
+                # 下载API已熔断，等到可以试探恢复时再重试，不立即放弃
+                if attempt < max_retries - 1:
+                    print(f"Download API circuit open for song {song_info.name}, retrying in {e.retry_after:.0f} seconds...")
+                    time.sleep(max(e.retry_after, 0))
+                else:
+                    return False, str(e)
             except Exception as e:
+                # 下载链接可能已失效，重试时重新获取
+                self.api_handler.invalidate_song_download_url(song_info.id, quality)
                 if attempt < max_retries - 1:
                     # 等待重试
                     time.sleep(retry_delay)
-                    print(f"Download attempt {attempt+1} failed for song {song_info['name']}, retrying in {retry_delay} seconds...")
+                    print(f"Download attempt {attempt+1} failed for song {song_info.name}, retrying in {retry_delay} seconds...")
                 else:
                     # 最后一次尝试失败
                     return False, f"Failed after {max_retries} attempts: {str(e)}"
     
-    def download_file(self, url, filepath, speed_limit=0):
-        """下载文件，支持限速"""
-        chunk_size = 1024
+    def build_filepath(self, song_info, save_path, filename_format=0):
+        """根据文件名格式构建歌曲保存路径"""
+        if filename_format == 0:
+            # 歌名 - 作者
+            filename = f"{song_info.name} - {song_info.artist}.mp3"
+        else:
+            # 作者 - 歌名
+            filename = f"{song_info.artist} - {song_info.name}.mp3"
+        # 替换非法字符
+        filename = self.sanitize_filename(filename)
+        return os.path.join(save_path, filename)
+    
+    def check_downloaded(self, song_info, quality, save_path, filepath):
+        """检查歌曲是否已下载到save_path，已下载时返回跳过提示，否则返回None
+        
+        按(歌曲ID, 音质, 目录)查询下载清单，不受文件名格式和歌手名变化的影响，清单中有记录即视为已下载，
+        不再访问文件系统。清单中没有记录但目标文件已存在时（如旧版本下载的文件或中断留下的文件），
+        只有与去重仓库中的同一首歌大小一致时才补录到清单并跳过，否则重新下载并覆盖。
+        未启用下载清单时只检查同名文件是否存在
+        """
+        if self.manifest is None:
+            if os.path.exists(filepath):
+                return f"已跳过: {os.path.basename(filepath)}（文件已存在）"
+            return None
+        
+        quality = quality or self.api_handler.get_default_quality()
+        record = self.manifest.find(song_info.id, quality, save_path)
+        if record is not None:
+            return f"已跳过: {os.path.basename(record['path'])}（已下载）"
+        if os.path.exists(filepath) and self.record_existing(song_info, quality, filepath):
+            return f"已跳过: {os.path.basename(filepath)}（文件已存在）"
+        return None
+    
+    def record_existing(self, song_info, quality, filepath):
+        """清单中没有记录的已存在文件与去重仓库中的同一首歌大小一致时补录到清单，返回是否已补录"""
+        object_path = self.store.lookup(song_info.id, quality) if self.store is not None else None
+        if object_path is None:
+            return False
+        try:
+            size = os.path.getsize(filepath)
+            if size != os.path.getsize(object_path):
+                return False
+        except OSError:
+            return False
+        self.manifest.record(song_info.id, quality, filepath, size, os.path.basename(object_path))
+        return True
+    
+    def record_download(self, song_info, quality, filepath, digest=None):
+        """下载完成后加入去重仓库并写入下载清单，digest为下载时计算的SHA-256"""
+        quality = quality or self.api_handler.get_default_quality()
+        digest = self.add_to_store(song_info, quality, filepath, digest) or digest
+        if self.manifest is not None:
+            self.manifest.record(song_info.id, quality, filepath, os.path.getsize(filepath), digest)
+    
+    def reuse_from_store(self, song_info, quality, filepath):
+        """去重仓库中已有该歌曲时链接到目标路径并写入下载清单，成功返回True"""
+        if self.store is None:
+            return False
+        if quality is None:
+            quality = self.api_handler.get_default_quality()
+        try:
+            digest = self.store.materialize(song_info.id, quality, filepath)
+            if digest is None:
+                return False
+            if self.manifest is not None:
+                self.manifest.record(song_info.id, quality, filepath, os.path.getsize(filepath), digest)
+            return True
+        except OSError as e:
+            print(f"Failed to link song {song_info.name} from store: {str(e)}")
+            return False
+    
+    def add_to_store(self, song_info, quality, filepath, digest=None):
+        """将下载完成的歌曲加入去重仓库，返回内容哈希，失败不影响下载结果"""
+        if self.store is None:
+            return None
+        if quality is None:
+            quality = self.api_handler.get_default_quality()
+        try:
+            return self.store.add(song_info.id, quality, filepath, digest)
+        except OSError as e:
+            print(f"Failed to add song {song_info.name} to store: {str(e)}")
+            return None
+    
+    def resolve_download_info(self, song_info, quality=None):
+        """获取歌曲下载链接和MD5，请求间隔由APIHandler按端点自动控制"""
+        download_info = self.api_handler.get_song_download_info(song_info.id, quality)
+        if not download_info['url']:
+            raise ValueError(f"Failed to get download URL for song: {song_info.name}")
+        return download_info
+    
+    def download_songs(self, songs, save_path, quality=None, speed_limit=0, skip_existing=False, filename_format=0,
+                       max_workers=None, callback=None, should_stop=None):
+        """使用线程池并发下载多首歌曲，返回与songs顺序一致的(song, success, message)结果列表
+        
+        callback(index, song, success, message)在每首歌曲完成后于调用线程中执行，
+        should_stop()返回True后不再开始新的歌曲，已开始的歌曲会继续完成
+        """
+        if max_workers is None:
+            max_workers = self.max_workers
+        max_workers = max(1, int(max_workers))
+        
+        # speed_limit为所有工作线程共享的总速度
+        self.set_speed_limit(speed_limit)
+        
+        # 下载当前歌曲的同时在后台解析之后几首歌的下载链接，已下载的歌曲不预取
+        downloaded_ids = set()
+        if skip_existing and self.manifest is not None:
+            downloaded_ids = self.manifest.downloaded_ids(save_path, quality or self.api_handler.get_default_quality())
+        prefetcher = UrlPrefetcher(
+            self.api_handler, songs, quality, self.prefetch_count,
+            should_prefetch=lambda song: str(song.id) not in downloaded_ids
+        )
+        
+        def task(index, song):
+            if should_stop is not None and should_stop():
+                return None
+            prefetcher.advance(index)
+            return self.download_song(song, save_path, quality, None, skip_existing, filename_format)
+        
+        results = [None] * len(songs)
+        with prefetcher, ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(task, i, song): i for i, song in enumerate(songs)}
+            for future in as_completed(futures):
+                outcome = future.result()
+                if outcome is None:
+                    # 已停止，未开始下载
+                    continue
+                
+                index = futures[future]
+                success, message = outcome
+                results[index] = (songs[index], success, message)
+                if callback is not None:
+                    callback(index, songs[index], success, message)
+        
+        return [result for result in results if result is not None]
+    
+    def use_segmented(self, quality=None):
+        """判断指定音质是否使用分段下载"""
+        if quality is None:
+            quality = self.api_handler.get_default_quality()
+        return self.segment_enabled and quality in self.segment_qualities
+    
+    def set_speed_limit(self, speed_limit):
+        """设置全局总下载速度（KiB/s，0表示不限速），下载过程中修改立即生效"""
+        burst_seconds = self.api_handler.config.get('download', {}).get('burst_seconds', 1.0)
+        bandwidth_limiter.set_rate(max(0, speed_limit) * 1024, burst_seconds)
+    
+    def download_file(self, url, filepath, segmented=False, expected_md5=None):
+        """下载并校验文件，通过全局限速器限速，支持断点续传，返回文件的SHA-256（未计算时为None，见download_file_preallocated）
+        
+        数据先写入filepath.part，写入的同时计算哈希，中断后再次调用会通过Range请求从已下载的位置继续；
+        大小与Content-Length一致、MD5与expected_md5一致（提供时）后才原子重命名为最终文件名，
+        校验不通过时丢弃.part文件并抛出IOError。segmented为True时对大文件分段并行下载
+        """
+        if segmented:
+            return self.download_file_segmented(url, filepath, expected_md5)
+        
+        part_path = filepath + '.part'
+        hashers = self.create_hashers(expected_md5)
+        
+        if os.path.exists(part_path + '.progress'):
+            # 旧版本预分配下载留下的.part文件，大小等于完整文件但内容可能尚未写完，不能用来续传
+            os.remove(part_path)
+            os.remove(part_path + '.progress')
+        
+        # 已下载的字节数
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {'Range': f'bytes={offset}-'} if offset > 0 else {}
         
         # 添加超时设置，防止网络请求无限期等待
-        with requests.get(url, stream=True, timeout=30) as response:
+        with get_session().get(url, stream=True, timeout=30, headers=headers) as response:
+            if response.status_code == 416 and offset > 0:
+                # 请求的起始位置超出文件大小，说明.part文件可能已经完整
+                if self.parse_content_range(response.headers.get('content-range', ''))[2] == offset:
+                    with open(part_path, 'rb') as file:
+                        self.copy_and_hash(file, None, hashers)
+                    return self.finalize_download(part_path, filepath, hashers, expected_md5)
+                # .part文件与服务器上的文件不一致，丢弃后重新下载
+                os.remove(part_path)
+                raise IOError(f"Partial file does not match remote file, discarded: {part_path}")
+            
             response.raise_for_status()
             
-            total_size = int(response.headers.get('content-length', 0))
+            if offset > 0 and response.status_code == 206:
+                # 服务器支持续传，校验返回的范围起点
+                range_start, _, _ = self.parse_content_range(response.headers.get('content-range', ''))
+                if range_start != offset:
+                    raise IOError(f"Unexpected Content-Range: {response.headers.get('content-range')}")
+                mode = 'ab'
+            else:
+                # 服务器不支持Range或是首次下载，从头开始
+                offset = 0
+                mode = 'wb'
             
-            with open(filepath, 'wb') as file:
-                start_time = time.time()
-                downloaded = 0
-                
-                for chunk in response.iter_content(chunk_size=chunk_size):
-                    if chunk:
-                        file.write(chunk)
-                        downloaded += len(chunk)
-                        
-                        # 限速处理
-                        if speed_limit > 0:
-                            elapsed = time.time() - start_time
-                            expected_time = downloaded / (speed_limit * 1024)
-                            if elapsed < expected_time:
-                                time.sleep(expected_time - elapsed)
-    
-    def download_playlist(self, list_id, save_path, quality=None, speed_limit=0):
+            # 压缩响应的Content-Length是压缩后的大小，无法与写入的字节数比较
+            content_length = response.headers.get('content-length')
+            compressed = response.headers.get('content-encoding', 'identity').lower() != 'identity'
+            total_size = offset + int(content_length) if content_length is not None and not compressed else 0
+            
+            if offset > 0:
+                # 续传时先用已下载的部分初始化哈希
+                with open(part_path, 'rb') as file:
+                    self.copy_and_hash(file, None, hashers)
+            
+            with open(part_path, mode) as file:
+                if self.preallocate and total_size:
+                    # 只分配空间不改变文件大小，.part文件大小仍表示已下载的字节数
+                    preallocate(file, total_size, keep_size=True)
+                downloaded = self.write_response(response, file, hashers)
+                file.flush()
+                os.fsync(file.fileno())
+        
+        # 连接提前断开时保留.part文件，下次从断点继续
+        if total_size and offset + downloaded < total_size:
+            raise IOError(f"Download incomplete: {offset + downloaded}/{total_size} bytes")
+        if total_size and offset + downloaded > total_size:
+            os.remove(part_path)
+            raise IOError(f"Download size mismatch, discarded: {offset + downloaded}/{total_size} bytes")
+        
+        return self.finalize_download(part_path, filepath, hashers, expected_md5)
+    
+    def create_hashers(self, expected_md5=None):
+        """创建下载时计算的哈希对象，API提供MD5时同时计算MD5"""
+        hashers = {'sha256': hashlib.sha256()}
+        if expected_md5:
+            hashers['md5'] = hashlib.md5()
+        return hashers
+    
+    def copy_and_hash(self, source, target, hashers):
+        """从source读取全部数据更新哈希，target不为None时同时写入target"""
+        buffer = bytearray(self.buffer_size)
+        view = memoryview(buffer)
+        while True:
+            size = source.readinto(buffer)
+            if not size:
+                break
+            for hasher in hashers.values():
+                hasher.update(view[:size])
+            if target is not None:
+                target.write(view[:size])
+    
+    def finalize_download(self, part_path, filepath, hashers, expected_md5=None):
+        """校验MD5后将.part文件原子重命名为最终文件，返回SHA-256"""
+        if expected_md5:
+            actual_md5 = hashers['md5'].hexdigest()
+            if actual_md5 != expected_md5.lower():
+                os.remove(part_path)
+                raise IOError(f"MD5 mismatch, discarded: expected {expected_md5}, got {actual_md5}")
+        os.replace(part_path, filepath)
+        return hashers['sha256'].hexdigest()
+    
+    def download_file_segmented(self, url, filepath, expected_md5=None):
+        """将大文件按字节范围分成多段并行下载后合并，服务器不支持Range或文件较小时退回单连接下载
+        
+        合并时顺序计算哈希，校验规则与download_file相同，返回SHA-256
+        """
+        total_size = self.probe_range_support(url)
+        if not total_size or total_size < self.segment_size * 2:
+            return self.download_file(url, filepath, expected_md5=expected_md5)
+        
+        # 每段不小于segment_size，段数不超过segment_count
+        count = max(1, min(self.segment_count, total_size // self.segment_size))
+        length = -(-total_size // count)
+        ranges = [(start, min(start + length, total_size) - 1) for start in range(0, total_size, length)]
+        if self.preallocate:
+            return self.download_file_preallocated(url, filepath, ranges, total_size, expected_md5)
+        part_paths = [f"{filepath}.part{i}" for i in range(len(ranges))]
+        
+        with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+            futures = [
+                executor.submit(self.download_range, url, part_path, start, end)
+                for part_path, (start, end) in zip(part_paths, ranges)
+            ]
+            # 任意一段失败则抛出异常，已完成的分段保留以便重试时续传
+            for future in futures:
+                future.result()
+        
+        # 按顺序合并分段并计算哈希，校验通过后再重命名为最终文件名
+        part_path = filepath + '.part'
+        hashers = self.create_hashers(expected_md5)
+        with open(part_path, 'wb') as file:
+            for segment_path in part_paths:
+                with open(segment_path, 'rb') as segment:
+                    self.copy_and_hash(segment, file, hashers)
+            file.flush()
+            os.fsync(file.fileno())
+        for segment_path in part_paths:
+            os.remove(segment_path)
+        
+        merged_size = os.path.getsize(part_path)
+        if merged_size != total_size:
+            os.remove(part_path)
+            raise IOError(f"Merged file size mismatch, discarded: {merged_size}/{total_size} bytes")
+        return self.finalize_download(part_path, filepath, hashers, expected_md5)
+    
+    def download_file_preallocated(self, url, filepath, ranges, total_size, expected_md5=None):
+        """预分配完整大小的.prealloc文件，各分段由独立的文件句柄直接写入自己的区域，无需合并
+        
+        每段已下载的字节数保存在.prealloc.progress中，用于断点续传。文件从一开始就是完整大小，
+        因此不使用.part，避免之后退回单连接下载时按文件大小误认为已下载完成。
+        各段乱序写入，下载时无法计算整个文件的哈希，只在需要校验MD5（segmented.verify）
+        或加入去重仓库时重新读取一遍文件，否则不校验MD5并返回None
+        """
+        part_path = filepath + '.prealloc'
+        progress_path = part_path + '.progress'
+        
+        progress = None
+        if os.path.exists(part_path) and os.path.getsize(part_path) == total_size:
+            try:
+                with open(progress_path, 'r', encoding='utf-8') as f:
+                    saved = json.load(f)
+                # 分段方式或文件大小变化时重新下载
+                if saved.get('size') == total_size and saved.get('ranges') == [list(r) for r in ranges]:
+                    progress = saved['done']
+            except (OSError, ValueError, KeyError):
+                pass
+        if progress is None:
+            with open(part_path, 'wb') as file:
+                preallocate(file, total_size)
+            progress = [0] * len(ranges)
+        
+        try:
+            with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+                futures = [
+                    executor.submit(self.download_region, url, part_path, start, end, progress, index)
+                    for index, (start, end) in enumerate(ranges)
+                ]
+                # 任意一段失败则抛出异常，已下载的部分记录在进度文件中以便重试时续传
+                for future in futures:
+                    future.result()
+        finally:
+            with open(progress_path, 'w', encoding='utf-8') as f:
+                json.dump({'size': total_size, 'ranges': [list(r) for r in ranges], 'done': progress}, f)
+        
+        os.remove(progress_path)
+        expected_md5 = expected_md5 if self.segment_verify else None
+        if not expected_md5 and self.store is None:
+            # 没有需要哈希的地方，省去重新读取整个文件
+            os.replace(part_path, filepath)
+            return None
+        hashers = self.create_hashers(expected_md5)
+        with open(part_path, 'rb') as file:
+            self.copy_and_hash(file, None, hashers)
+        return self.finalize_download(part_path, filepath, hashers, expected_md5)
+    
+    def download_region(self, url, part_path, start, end, progress, index):
+        """下载[start, end]字节范围，直接写入预分配文件的对应位置，progress[index]为该段已下载的字节数"""
+        length = end - start + 1
+        offset = progress[index]
+        if offset >= length:
+            return
+        
+        headers = {'Range': f'bytes={start + offset}-{end}'}
+        with get_session().get(url, stream=True, timeout=30, headers=headers) as response:
+            response.raise_for_status()
+            if response.status_code != 206:
+                raise IOError(f"Server ignored Range request for bytes {start + offset}-{end}")
+            # 返回的范围必须与请求一致，否则会覆盖相邻分段的数据
+            range_start, range_end, _ = self.parse_content_range(response.headers.get('content-range', ''))
+            if range_start != start + offset or range_end != end:
+                raise IOError(f"Unexpected Content-Range: {response.headers.get('content-range')}")
+            
+            # 每段使用自己的文件句柄，写入的区域互不重叠，无需加锁
+            with open(part_path, 'r+b') as file:
+                file.seek(start + offset)
+                try:
+                    self.write_response(response, file)
+                finally:
+                    # 先落盘再记录进度，避免进度超前于实际写入的数据
+                    file.flush()
+                    os.fsync(file.fileno())
+                    progress[index] = min(file.tell() - start, length)
+        
+        if progress[index] != length:
+            raise IOError(f"Segment incomplete: {progress[index]}/{length} bytes")
+    
+    def probe_range_support(self, url):
+        """探测服务器是否支持Range请求，支持时返回文件总大小，否则返回0
+        
+        网络错误时抛出异常，由调用方重试，而不是当作不支持Range退回单连接下载
+        """
+        with get_session().get(url, stream=True, timeout=30, headers={'Range': 'bytes=0-0'}) as response:
+            if response.status_code != 206:
+                return 0
+            return self.parse_content_range(response.headers.get('content-range', ''))[2] or 0
+    
+    def download_range(self, url, part_path, start, end):
+        """下载[start, end]字节范围到分段文件，支持断点续传"""
+        length = end - start + 1
+        
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        if offset > length:
+            # 分段文件与当前分段方式不一致，重新下载
+            offset = 0
+        if offset == length:
+            return
+        
+        headers = {'Range': f'bytes={start + offset}-{end}'}
+        with get_session().get(url, stream=True, timeout=30, headers=headers) as response:
+            response.raise_for_status()
+            if response.status_code != 206:
+                raise IOError(f"Server ignored Range request for bytes {start + offset}-{end}")
+            
+            with open(part_path, 'ab' if offset > 0 else 'wb') as file:
+                downloaded = self.write_response(response, file)
+        
+        if offset + downloaded != length:
+            raise IOError(f"Segment incomplete: {offset + downloaded}/{length} bytes")
+    
+    def write_response(self, response, file, hashers=None):
+        """将流式响应写入文件，返回写入的字节数
+        
+        未压缩的响应直接读入可复用的缓冲区，避免为每个数据块创建新的bytes对象；
+        每个缓冲区只从全局令牌桶取用一次流量，所有传输共享总速度；
+        hashers中的哈希对象随写入同步更新，无需下载后再读一遍文件
+        """
+        downloaded = 0
+        hashers = list(hashers.values()) if hashers else []
+        
+        if response.headers.get('content-encoding', 'identity').lower() != 'identity':
+            # 压缩响应需要由requests解码
+            for chunk in response.iter_content(chunk_size=self.buffer_size):
+                if chunk:
+                    bandwidth_limiter.consume(len(chunk))
+                    for hasher in hashers:
+                        hasher.update(chunk)
+                    file.write(chunk)
+                    downloaded += len(chunk)
+            return downloaded
+        
+        buffer = bytearray(self.buffer_size)
+        view = memoryview(buffer)
+        while True:
+            size = response.raw.readinto(buffer)
+            if not size:
+                break
+            bandwidth_limiter.consume(size)
+            for hasher in hashers:
+                hasher.update(view[:size])
+            file.write(view[:size])
+            downloaded += size
+        return downloaded
+    
+    def parse_content_range(self, content_range):
+        """解析Content-Range响应头，返回(起始位置, 结束位置, 文件总大小)，无法解析的部分为None"""
+        import re
+        match = re.match(r'bytes\s+(?:(\d+)-(\d+)|\*)/(\d+|\*)', content_range.strip())
+        if not match:
+            return None, None, None
+        start, end, total = match.groups()
+        return (
+            int(start) if start is not None else None,
+            int(end) if end is not None else None,
+            int(total) if total != '*' else None
+        )
+    
+    def download_playlist(self, list_id, save_path, quality=None, speed_limit=0, max_workers=None):
         """下载整个歌单"""
         try:
             # 获取歌单歌曲列表
@@ -98,18 +566,9 @@ class SongDownloader:
             # 确保保存目录存在
             os.makedirs(save_path, exist_ok=True)
             
-            results = []
-            for song in songs:
-                success, message = self.download_song(song, save_path, quality, speed_limit)
-                results.append({
-                    'song': song,
-                    'success': success,
-                    'message': message
-                })
-            
-            return results
+            return self.download_songs(songs, save_path, quality, speed_limit, max_workers=max_workers)
         except Exception as e:
-            return [{'song': None, 'success': False, 'message': str(e)}]
+            return [(None, False, str(e))]
     
     def sanitize_filename(self, filename):
         """替换文件名中的非法字符"""
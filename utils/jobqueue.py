@@ -0,0 +1,287 @@
+import os
+import sqlite3
+import threading
+import time
+from utils.pipeline import DownloadPipeline
+from utils.store import link_file
+from utils.track import Track
+
+class JobQueue:
+    """持久化的歌单下载任务队列（SQLite），程序退出或崩溃后可从中断处继续
+
+    每个任务对应一个歌单，按优先级从高到低执行；任务的歌曲列表和每首歌曲的状态都会保存，
+    歌曲状态: pending（待下载）、done（已完成）、skipped（已跳过）、failed（失败，下次运行时重试）
+    """
+    def __init__(self, db_path='jobs.db'):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        with self.lock:
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    playlist_id TEXT NOT NULL,
+                    save_path TEXT NOT NULL,
+                    quality TEXT NOT NULL,
+                    filename_format INTEGER NOT NULL DEFAULT 0,
+                    skip_existing INTEGER NOT NULL DEFAULT 1,
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    has_tracks INTEGER NOT NULL DEFAULT 0,
+                    message TEXT,
+                    created_at REAL NOT NULL,
+                    finished_at REAL
+                )
+            ''')
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS job_tracks (
+                    job_id INTEGER NOT NULL,
+                    position INTEGER NOT NULL,
+                    song_id TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    artist TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    message TEXT,
+                    PRIMARY KEY (job_id, position)
+                )
+            ''')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_job_tracks_status ON job_tracks (job_id, status)')
+            self.conn.commit()
+
+    def add_job(self, playlist_id, save_path, quality, filename_format=0, skip_existing=True, priority=0):
+        """添加歌单下载任务，返回任务ID"""
+        with self.lock:
+            cursor = self.conn.execute(
+                'INSERT INTO jobs (playlist_id, save_path, quality, filename_format, skip_existing, priority, created_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (str(playlist_id), save_path, quality, filename_format, int(skip_existing), priority, time.time())
+            )
+            self.conn.commit()
+            return cursor.lastrowid
+
+    def remove_job(self, job_id):
+        """删除任务及其歌曲记录"""
+        with self.lock:
+            with self.conn:
+                self.conn.execute('DELETE FROM job_tracks WHERE job_id = ?', (job_id,))
+                self.conn.execute('DELETE FROM jobs WHERE id = ?', (job_id,))
+
+    def clear_finished(self):
+        """删除所有已完成的任务"""
+        with self.lock:
+            with self.conn:
+                self.conn.execute("DELETE FROM job_tracks WHERE job_id IN (SELECT id FROM jobs WHERE status = 'done')")
+                self.conn.execute("DELETE FROM jobs WHERE status = 'done'")
+
+    def unfinished_jobs(self):
+        """按优先级从高到低返回所有未完成的任务"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT * FROM jobs WHERE status != 'done' ORDER BY priority DESC, id"
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def list_jobs(self):
+        """返回所有任务及各状态的歌曲数"""
+        with self.lock:
+            rows = self.conn.execute('''
+                SELECT jobs.*,
+                       COUNT(job_tracks.position) AS total,
+                       SUM(job_tracks.status IN ('done', 'skipped')) AS completed,
+                       SUM(job_tracks.status = 'failed') AS failed
+                FROM jobs LEFT JOIN job_tracks ON job_tracks.job_id = jobs.id
+                GROUP BY jobs.id ORDER BY jobs.priority DESC, jobs.id
+            ''').fetchall()
+        return [dict(row) for row in rows]
+
+    def set_tracks(self, job_id, songs):
+        """保存任务的歌曲列表，之后恢复任务时无需重新获取歌单"""
+        with self.lock:
+            with self.conn:
+                self.conn.execute('DELETE FROM job_tracks WHERE job_id = ?', (job_id,))
+                self.conn.executemany(
+                    'INSERT INTO job_tracks (job_id, position, song_id, name, artist) VALUES (?, ?, ?, ?, ?)',
+                    [(job_id, position, str(song.id), song.name, song.artist)
+                     for position, song in enumerate(songs)]
+                )
+                self.conn.execute('UPDATE jobs SET has_tracks = 1 WHERE id = ?', (job_id,))
+
+    def unfinished_tracks(self, job_id):
+        """返回任务中待下载和失败的歌曲，每项为(在歌单中的位置, Track)"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT position, song_id, name, artist FROM job_tracks "
+                "WHERE job_id = ? AND status IN ('pending', 'failed') ORDER BY position",
+                (job_id,)
+            ).fetchall()
+        return [(row['position'], Track(row['song_id'], row['name'], row['artist'])) for row in rows]
+
+    def update_track(self, job_id, position, status, message=None):
+        """记录单首歌曲的处理结果"""
+        with self.lock:
+            self.conn.execute(
+                'UPDATE job_tracks SET status = ?, message = ? WHERE job_id = ? AND position = ?',
+                (status, message, job_id, position)
+            )
+            self.conn.commit()
+
+    def set_job_status(self, job_id, status, message=None):
+        """更新任务状态"""
+        with self.lock:
+            self.conn.execute(
+                'UPDATE jobs SET status = ?, message = ?, finished_at = ? WHERE id = ?',
+                (status, message, time.time() if status == 'done' else None, job_id)
+            )
+            self.conn.commit()
+
+    def close(self):
+        """关闭数据库连接"""
+        with self.lock:
+            self.conn.close()
+
+
+class JobRunner:
+    """执行任务队列中所有未完成的任务
+
+    运行前汇总所有任务的未完成歌曲，按(歌曲ID, 音质)去重：同一首歌只下载一次（优先级最高的任务中），
+    其他任务中的同一首歌在下载完成后直接链接过去；所有任务的歌曲在同一条流水线中并发下载
+    """
+    def __init__(self, downloader, queue):
+        self.downloader = downloader
+        self.api_handler = downloader.api_handler
+        self.queue = queue
+
+    def run(self, speed_limit=0, max_workers=None, resolve_workers=None, callback=None, should_stop=None, log=print):
+        """运行队列，返回包含success、skip、fail、total的统计字典
+
+        callback(done, total, job, song, success, message)在每首歌曲完成后执行，
+        should_stop()返回True后不再开始新的歌曲，未完成的歌曲保留到下次运行
+        """
+        def stopped():
+            return should_stop is not None and should_stop()
+
+        jobs = self.queue.unfinished_jobs()
+
+        # 获取尚未保存歌曲列表的任务的歌单
+        for job in jobs:
+            if job['has_tracks'] or stopped():
+                continue
+            try:
+                log(f"任务{job['id']}: 正在获取歌单 {job['playlist_id']} 的歌曲列表...")
+                songs = self.api_handler.get_playlist_songs(job['playlist_id'])
+                if not getattr(songs, 'complete', True):
+                    # 保存后任务不会再获取歌单，缺少的歌曲就永远不会下载
+                    raise ValueError("歌单不完整，下次运行时重新获取")
+                self.queue.set_tracks(job['id'], songs)
+                job['has_tracks'] = 1
+            except Exception as e:
+                log(f"任务{job['id']}: 获取歌单失败 - {str(e)}")
+                self.queue.set_job_status(job['id'], 'failed', str(e))
+        jobs = [job for job in jobs if job['has_tracks']]
+
+        # 汇总并去重：每个(歌曲ID, 音质)只由第一个（优先级最高的）任务下载
+        primaries = {}
+        followers = []
+        for job in jobs:
+            for position, track in self.queue.unfinished_tracks(job['id']):
+                key = (track.id, job['quality'])
+                target = self.downloader.build_filepath(track, job['save_path'], job['filename_format'])
+                if key in primaries:
+                    followers.append((job, position, track, target, key))
+                else:
+                    primaries[key] = (job, position, track, target)
+
+        total = len(primaries) + len(followers)
+        counts = {'success': 0, 'skip': 0, 'fail': 0, 'done': 0, 'total': total}
+        if followers:
+            log(f"共 {total} 首待处理歌曲，其中 {len(followers)} 首与其他任务重复，只下载一次")
+
+        def finish(job, position, track, success, message):
+            if success:
+                status = 'skipped' if "已跳过" in message else 'done'
+                counts['skip' if status == 'skipped' else 'success'] += 1
+            else:
+                status = 'failed'
+                counts['fail'] += 1
+            counts['done'] += 1
+            self.queue.update_track(job['id'], position, status, message)
+            if callback is not None:
+                callback(counts['done'], total, job, track, success, message)
+
+        # 主歌曲按(音质, 是否跳过已下载)分组，每组一条流水线，按组内最高的任务优先级依次运行；
+        # 每首歌保存到各自任务的目录
+        completed = {}
+        groups = {}
+        priorities = {}
+        for item in primaries.values():
+            job = item[0]
+            group = (job['quality'], bool(job['skip_existing']))
+            groups.setdefault(group, []).append(item)
+            priorities[group] = max(priorities.get(group, job['priority']), job['priority'])
+        for quality, skip_existing in sorted(groups, key=lambda group: -priorities[group]):
+            if stopped():
+                break
+            items = groups[(quality, skip_existing)]
+            songs = [track for _, _, track, _ in items]
+
+            def on_song_done(index, song, success, message, items=items):
+                job, position, track, target = items[index]
+                if success:
+                    source = self.downloaded_path(track, job['quality'], target)
+                    if source is not None:
+                        completed[(track.id, job['quality'])] = source
+                finish(job, position, track, success, message)
+
+            pipeline = DownloadPipeline(
+                self.downloader,
+                resolve_workers or self.downloader.resolve_workers,
+                max_workers or self.downloader.max_workers
+            )
+            pipeline.run(songs, None, quality, speed_limit, skip_existing,
+                         callback=on_song_done, should_stop=should_stop,
+                         targets=[target for _, _, _, target in items])
+
+        # 重复的歌曲从已完成的文件链接过去
+        for job, position, track, target, key in followers:
+            if stopped():
+                break
+            source = completed.get(key)
+            if source is None:
+                # 主歌曲未成功，保留为失败状态，下次运行时重试
+                finish(job, position, track, False, "同一歌曲在其他任务中下载失败")
+                continue
+            try:
+                if os.path.abspath(source) != os.path.abspath(target):
+                    os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+                    link_file(source, target)
+                    self.downloader.record_download(track, key[1], target)
+                finish(job, position, track, True, f"已链接: {target}（与其他任务共享）")
+            except OSError as e:
+                finish(job, position, track, False, f"链接失败: {str(e)}")
+
+        # 所有歌曲都已完成的任务标记为完成
+        if not stopped():
+            for job in jobs:
+                if not self.queue.unfinished_tracks(job['id']):
+                    self.queue.set_job_status(job['id'], 'done')
+
+        return counts
+
+    def downloaded_path(self, track, quality, target):
+        """主歌曲成功后实际可用的文件：target不存在时（按下载清单跳过了不同文件名的文件）使用清单中记录的路径，
+        都不存在时返回None
+        """
+        if os.path.exists(target):
+            return target
+        manifest = self.downloader.manifest
+        if manifest is None:
+            return None
+        record = manifest.find(track.id, quality, os.path.dirname(target))
+        if record is not None and os.path.exists(record['path']):
+            return record['path']
+        return None
@@ -0,0 +1,218 @@
+import codecs
+import json
+
+WHITESPACE = ' \t\n\r'
+# 可能出现在数字中间的字符
+NUMBER_CHARS = '0123456789.eE+-'
+
+# 缓冲区中的数据还不足以解析出完整的值
+INCOMPLETE = object()
+
+class JsonArrayStream:
+    """增量解析JSON文本，边接收边取出指定路径下数组中的元素
+
+    paths为候选路径的步骤元组列表，如[(), ('result', 'tracks'), ('tracks',)]，()表示根节点本身；
+    取响应中最先出现的、值为数组的候选路径。路径之外的值用json.JSONDecoder.raw_decode整体跳过，
+    数组元素逐个解码，已解析的文本会从缓冲区中丢弃，内存占用与响应大小无关。
+    capture中路径的值（如歌单的trackIds）整体解码后保存在captured中，以路径为键
+    """
+    OBJECT = 'object'
+    ARRAY = 'array'
+    ITEMS = 'items'
+
+    def __init__(self, paths, capture=()):
+        # 候选路径为(剩余步骤, 目标)，目标为None表示要逐个取出元素的数组，否则为要保存的路径
+        self.paths = [(tuple(path), None) for path in paths] + [(tuple(path), tuple(path)) for path in capture]
+        self.capture_count = len(set(tuple(path) for path in capture))
+        self.captured = {}
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        # 上次解码因数据不完整失败时，未解析文本至少达到该长度才重试，避免大的值被反复解码
+        self.need = 0
+        # 栈中每层为[类型, 候选路径, 状态, 当前键或下标]
+        self.stack = []
+        self.started = False
+        self.final = False
+        self.found = False
+        self.items_done = False
+        self.done = False
+
+    def feed(self, text):
+        """追加一段文本，返回新解析出的数组元素列表"""
+        self.buffer = self.buffer[self.pos:] + text
+        self.pos = 0
+        items = []
+        if not self.done and len(self.buffer) >= self.need:
+            self.need = 0
+            self.parse(items)
+        return items
+
+    def close(self, text=''):
+        """输入结束，返回剩余的数组元素；JSON不完整或格式错误时抛出ValueError"""
+        self.final = True
+        items = self.feed(text)
+        if not self.done:
+            self.need = 0
+            self.parse(items)
+        if not self.done:
+            raise ValueError("JSON数据不完整")
+        return items
+
+    def parse(self, items):
+        """从缓冲区中解析尽可能多的内容，数据不足时返回"""
+        buffer = self.buffer
+        while not self.done:
+            pos = self.pos
+            while pos < len(buffer) and buffer[pos] in WHITESPACE:
+                pos += 1
+            self.pos = pos
+            if pos >= len(buffer):
+                if self.final and self.started and not self.stack:
+                    self.done = True
+                return
+
+            if not self.stack:
+                if self.started:
+                    # 根节点之后只允许空白
+                    raise ValueError(f"JSON数据在第{pos}个字符处有多余内容")
+                self.started = True
+                if not self.enter_value(self.paths):
+                    self.started = False
+                    return
+                if not self.stack and not self.final:
+                    # 根节点是标量或被整体跳过，没有需要的数组
+                    self.done = True
+                continue
+
+            frame = self.stack[-1]
+            kind, candidates, state = frame[0], frame[1], frame[2]
+            char = buffer[pos]
+            if state == 'next':
+                # 上一个值之后，等待逗号或容器结束
+                if char == ',':
+                    self.pos += 1
+                    frame[2] = 'key' if kind == self.OBJECT else 'value'
+                    if kind != self.OBJECT:
+                        frame[3] += 1
+                elif char == (']' if kind != self.OBJECT else '}'):
+                    self.pos += 1
+                    self.stack.pop()
+                    if kind == self.ITEMS:
+                        self.finish_items()
+                else:
+                    raise ValueError(f"JSON数据在第{pos}个字符处格式错误")
+            elif kind == self.OBJECT and state == 'key':
+                if char == '}' and frame[3] is None:
+                    self.pos += 1
+                    self.stack.pop()
+                    continue
+                key = self.decode()
+                if key is INCOMPLETE:
+                    return
+                if not isinstance(key, str):
+                    raise ValueError(f"JSON数据在第{pos}个字符处格式错误")
+                frame[2], frame[3] = 'colon', key
+            elif state == 'colon':
+                if char != ':':
+                    raise ValueError(f"JSON数据在第{pos}个字符处格式错误")
+                self.pos += 1
+                frame[2] = 'value'
+            elif kind == self.ITEMS:
+                if char == ']' and frame[3] == 0:
+                    self.pos += 1
+                    self.stack.pop()
+                    self.finish_items()
+                    continue
+                item = self.decode()
+                if item is INCOMPLETE:
+                    return
+                items.append(item)
+                frame[2] = 'next'
+            else:
+                if kind == self.ARRAY and char == ']' and frame[3] == 0:
+                    self.pos += 1
+                    self.stack.pop()
+                    continue
+                step = frame[3]
+                matched = [(path[1:], target) for path, target in candidates if path[0] == step]
+                frame[2] = 'next'
+                if not self.enter_value(matched):
+                    frame[2] = 'value'
+                    return
+
+    def finish_items(self):
+        """要取出元素的数组已经结束，需要保存的值也都已找到时忽略响应中剩余的内容"""
+        self.items_done = True
+        self.done = len(self.captured) >= self.capture_count
+
+    def enter_value(self, candidates):
+        """处理缓冲区当前位置的值：进入候选路径经过的对象或数组，保存capture中的值，其他值整体跳过；
+        数据不足时返回False
+        """
+        char = self.buffer[self.pos]
+        for path, target in candidates:
+            if path:
+                continue
+            if target is None and char == '[' and not self.found:
+                self.pos += 1
+                self.found = True
+                self.stack.append([self.ITEMS, (), 'value', 0])
+                return True
+            if target is not None and target not in self.captured:
+                value = self.decode()
+                if value is INCOMPLETE:
+                    return False
+                self.captured[target] = value
+                if self.items_done and len(self.captured) >= self.capture_count:
+                    self.done = True
+                return True
+        rest = [(path, target) for path, target in candidates if path]
+        if char == '{' and any(isinstance(path[0], str) for path, _ in rest):
+            self.pos += 1
+            self.stack.append([self.OBJECT, rest, 'key', None])
+            return True
+        if char == '[' and any(isinstance(path[0], int) for path, _ in rest):
+            self.pos += 1
+            self.stack.append([self.ARRAY, rest, 'value', 0])
+            return True
+        return self.decode() is not INCOMPLETE
+
+    def decode(self):
+        """解码缓冲区当前位置的一个完整值，数据不足时返回INCOMPLETE"""
+        unparsed = len(self.buffer) - self.pos
+        try:
+            value, end = self.decoder.raw_decode(self.buffer, self.pos)
+        except json.JSONDecodeError:
+            if self.final:
+                raise
+            self.need = unparsed * 2
+            return INCOMPLETE
+        if not self.final and (end >= len(self.buffer) or self.buffer[end] in NUMBER_CHARS):
+            # 位于末尾的值可能还没有接收完整，如'3.'中的3只是3.25的一部分
+            self.need = unparsed + 1
+            return INCOMPLETE
+        self.pos = end
+        return value
+
+def iter_array_items(chunks, paths, encoding='utf-8-sig', capture=(), captured=None):
+    """从字节块（如response.iter_content()）中增量解析paths中数组的元素，每个字节块解析出的元素作为一批返回
+
+    找到的数组结束且capture中的值都已找到后不再读取剩余的字节块；没有找到数组时不返回任何元素。
+    captured为字典时，结束后写入capture中找到的值
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    stream = JsonArrayStream(paths, capture)
+    try:
+        for chunk in chunks:
+            items = stream.feed(decoder.decode(chunk))
+            if items:
+                yield items
+            if stream.done:
+                return
+        items = stream.close(decoder.decode(b'', final=True))
+        if items:
+            yield items
+    finally:
+        if captured is not None:
+            captured.update(stream.captured)
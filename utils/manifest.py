@@ -0,0 +1,126 @@
+import os
+import sqlite3
+import threading
+import time
+
+class DownloadManifest:
+    """记录所有已完成下载的SQLite清单，作为跳过已下载歌曲的依据
+
+    每条记录包含歌曲ID、音质、文件路径、大小、内容哈希和完成时间，
+    按(歌曲ID, 音质, 保存目录)建立索引，查询时无需逐个检查文件系统
+    """
+    def __init__(self, db_path='manifest.db'):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        # 多个下载线程共享同一个连接，由self.lock串行化访问
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self.lock:
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS downloads (
+                    path TEXT PRIMARY KEY,
+                    directory TEXT NOT NULL,
+                    song_id TEXT NOT NULL,
+                    quality TEXT NOT NULL,
+                    size INTEGER,
+                    hash TEXT,
+                    downloaded_at REAL NOT NULL
+                )
+            ''')
+            self.conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_downloads_song
+                ON downloads (song_id, quality, directory)
+            ''')
+            # 每个歌单上次同步到某个目录时的歌曲列表，用于增量同步
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS playlist_tracks (
+                    playlist_id TEXT NOT NULL,
+                    directory TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    song_id TEXT NOT NULL,
+                    PRIMARY KEY (playlist_id, directory, position)
+                )
+            ''')
+            self.conn.commit()
+
+    def normalize_path(self, path):
+        """统一路径格式，保证同一目录的不同写法对应同一条记录"""
+        return os.path.normcase(os.path.abspath(path))
+
+    def record(self, song_id, quality, path, size=None, digest=None):
+        """记录一次完成的下载，同一路径的旧记录会被覆盖"""
+        path = self.normalize_path(path)
+        with self.lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO downloads (path, directory, song_id, quality, size, hash, downloaded_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (path, os.path.dirname(path), str(song_id), quality, size, digest, time.time())
+            )
+            self.conn.commit()
+
+    def find(self, song_id, quality, directory):
+        """查找指定目录中某首歌曲的下载记录，返回字典，不存在时返回None"""
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT path, size, hash, downloaded_at FROM downloads '
+                'WHERE song_id = ? AND quality = ? AND directory = ? LIMIT 1',
+                (str(song_id), quality, self.normalize_path(directory))
+            ).fetchone()
+        if row is None:
+            return None
+        return {'path': row[0], 'size': row[1], 'hash': row[2], 'downloaded_at': row[3]}
+
+    def downloaded_ids(self, directory, quality):
+        """返回指定目录和音质下所有已下载歌曲ID的集合，用于批量判断"""
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT song_id FROM downloads WHERE directory = ? AND quality = ?',
+                (self.normalize_path(directory), quality)
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def get_playlist_snapshot(self, playlist_id, directory):
+        """获取歌单上次同步到指定目录时的歌曲ID列表，从未同步过时返回None"""
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT song_id FROM playlist_tracks WHERE playlist_id = ? AND directory = ? ORDER BY position',
+                (str(playlist_id), self.normalize_path(directory))
+            ).fetchall()
+        return [row[0] for row in rows] if rows else None
+
+    def save_playlist_snapshot(self, playlist_id, directory, song_ids):
+        """保存歌单本次同步的歌曲ID列表，替换上一次的记录"""
+        directory = self.normalize_path(directory)
+        with self.lock:
+            with self.conn:
+                self.conn.execute(
+                    'DELETE FROM playlist_tracks WHERE playlist_id = ? AND directory = ?',
+                    (str(playlist_id), directory)
+                )
+                self.conn.executemany(
+                    'INSERT INTO playlist_tracks (playlist_id, directory, position, song_id) VALUES (?, ?, ?, ?)',
+                    [(str(playlist_id), directory, position, str(song_id)) for position, song_id in enumerate(song_ids)]
+                )
+
+    def in_other_playlist(self, song_id, directory, playlist_id):
+        """判断歌曲是否属于同步到同一目录的其他歌单"""
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT 1 FROM playlist_tracks WHERE song_id = ? AND directory = ? AND playlist_id != ? LIMIT 1',
+                (str(song_id), self.normalize_path(directory), str(playlist_id))
+            ).fetchone()
+        return row is not None
+
+    def remove(self, path):
+        """删除指定路径的下载记录"""
+        with self.lock:
+            self.conn.execute('DELETE FROM downloads WHERE path = ?', (self.normalize_path(path),))
+            self.conn.commit()
+
+    def close(self):
+        """关闭数据库连接"""
+        with self.lock:
+            self.conn.close()
@@ -1,4 +1,5 @@
 import os
+import shutil
 import subprocess
 import glob
 import sys
@@ -49,7 +50,8 @@ class NCMConverter:
             if os.path.exists(ncmdump_path):
                 return ncmdump_path
         
-        return None
+        # 非Windows系统上的ncmdump没有.exe后缀
+        return shutil.which('ncmdump')
     
     def convert_single_file(self, ncm_file, output_dir=None):
         """转换单个NCM文件"""
@@ -88,21 +90,17 @@ class NCMConverter:
             return False, str(e)
     
     def batch_convert(self, input_dir, output_dir=None):
-        """批量转换NCM文件"""
+        """批量转换NCM文件，返回(文件, 是否成功, 信息)元组的列表"""
         # 获取所有NCM文件
         ncm_files = glob.glob(os.path.join(input_dir, '*.ncm'))
         
         if not ncm_files:
-            return [{'file': None, 'success': False, 'message': f"No NCM files found in {input_dir}"}]
+            return [(None, False, f"No NCM files found in {input_dir}")]
         
         results = []
         
         for ncm_file in tqdm(ncm_files, desc="Converting NCM files"):
             success, message = self.convert_single_file(ncm_file, output_dir)
-            results.append({
-                'file': ncm_file,
-                'success': success,
-                'message': message
-            })
+            results.append((ncm_file, success, message))
         
         return results
\ No newline at end of file
@@ -0,0 +1,199 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from utils.circuit import CircuitOpenError
+
+class DownloadPipeline:
+    """两阶段异步下载流水线：解析阶段获取歌曲直链，传输阶段下载文件
+
+    两个阶段之间通过有界队列连接，各自拥有独立的并发数，
+    API较慢时不会拖住传输，传输较慢时解析阶段也不会无限制地提前获取直链
+    """
+    def __init__(self, downloader, resolve_workers=2, transfer_workers=4, queue_size=None):
+        self.downloader = downloader
+        self.resolve_workers = max(1, int(resolve_workers))
+        self.transfer_workers = max(1, int(transfer_workers))
+        # 队列默认容纳两轮传输所需的直链
+        self.queue_size = queue_size or self.transfer_workers * 2
+
+    def run(self, songs, save_path, quality=None, speed_limit=0, skip_existing=False, filename_format=0,
+            callback=None, should_stop=None, targets=None):
+        """在新的事件循环中运行流水线，返回与songs顺序一致的(song, success, message)结果列表
+
+        songs可以是迭代器（如APIHandler.iter_playlist_songs边接收边解析的歌曲），此时在后台线程中
+        逐首取出，先取到的歌曲立即开始解析和传输，不必等待整个歌单；
+        callback(index, song, success, message)在每首歌曲完成后于调用线程中执行，
+        should_stop()返回True后不再开始新的解析和传输；
+        targets为与songs一一对应的保存路径列表，给出时忽略save_path和filename_format
+        """
+        return asyncio.run(self.run_async(songs, save_path, quality, speed_limit, skip_existing,
+                                          filename_format, callback, should_stop, targets))
+
+    async def run_async(self, songs, save_path, quality=None, speed_limit=0, skip_existing=False, filename_format=0,
+                        callback=None, should_stop=None, targets=None):
+        """流水线的协程实现"""
+        loop = asyncio.get_running_loop()
+        # requests和文件操作（查询下载清单、从仓库复制、计算哈希）为阻塞调用，
+        # 两个阶段分别在独立的线程池中执行，互不占用，也不阻塞事件循环
+        resolve_executor = ThreadPoolExecutor(max_workers=self.resolve_workers)
+        transfer_executor = ThreadPoolExecutor(max_workers=self.transfer_workers)
+
+        # speed_limit为所有传输任务共享的总速度
+        self.downloader.set_speed_limit(speed_limit)
+
+        # 大文件分段下载
+        segmented = self.downloader.use_segmented(quality)
+
+        song_queue = asyncio.Queue()
+        url_queue = asyncio.Queue(maxsize=self.queue_size)
+        if isinstance(songs, (list, tuple)):
+            song_list = songs
+            results = [None] * len(songs)
+        else:
+            # 歌曲陆续到达，已收到的歌曲和结果逐个追加
+            song_list = []
+            results = []
+
+        def stopped():
+            return should_stop is not None and should_stop()
+
+        def finish(index, success, message):
+            results[index] = (song_list[index], success, message)
+            if callback is not None:
+                callback(index, song_list[index], success, message)
+
+        async def resolver():
+            """解析阶段：将歌曲ID转换为下载直链"""
+            while True:
+                item = await song_queue.get()
+                if item is None:
+                    break
+                index, song = item
+                if stopped():
+                    continue
+
+                if targets is not None:
+                    filepath = targets[index]
+                else:
+                    filepath = self.downloader.build_filepath(song, save_path, filename_format)
+                # 检查歌曲是否已下载，如果是则跳过
+                if skip_existing:
+                    skip_message = await loop.run_in_executor(resolve_executor, self.downloader.check_downloaded,
+                                                              song, quality, os.path.dirname(filepath), filepath)
+                    if skip_message:
+                        finish(index, True, skip_message)
+                        continue
+                # 其他歌单已下载过同一首歌时直接从仓库链接，不支持硬链接时会复制整个文件
+                if await loop.run_in_executor(resolve_executor, self.downloader.reuse_from_store,
+                                              song, quality, filepath):
+                    finish(index, True, f"已链接: {filepath}（复用已下载的文件）")
+                    continue
+
+                for attempt in range(self.downloader.max_retries):
+                    try:
+                        info = await loop.run_in_executor(resolve_executor, self.downloader.resolve_download_info,
+                                                          song, quality)
+                        await url_queue.put((index, song, info, filepath))
+                        break
+                    except CircuitOpenError as e:
+                        # 下载API已熔断，等到可以试探恢复时再重试，不在熔断期间把剩余歌曲全部判为失败
+                        if attempt < self.downloader.max_retries - 1 and not stopped():
+                            print(f"Download API circuit open for song {song.name}, retrying in {e.retry_after:.0f} seconds...")
+                            await asyncio.sleep(max(e.retry_after, 0))
+                        else:
+                            finish(index, False, str(e))
+                            break
+                    except Exception as e:
+                        if attempt < self.downloader.max_retries - 1 and not stopped():
+                            print(f"Resolve attempt {attempt+1} failed for song {song.name}, retrying in {self.downloader.retry_delay} seconds...")
+                            await asyncio.sleep(self.downloader.retry_delay)
+                        else:
+                            finish(index, False, f"Failed after {attempt+1} attempts: {str(e)}")
+                            break
+
+        async def transfer():
+            """传输阶段：从队列中取出直链并下载文件"""
+            while True:
+                item = await url_queue.get()
+                if item is None:
+                    break
+                index, song, info, filepath = item
+                if stopped():
+                    continue
+
+                os.makedirs(os.path.dirname(filepath) or '.', exist_ok=True)
+                for attempt in range(self.downloader.max_retries):
+                    try:
+                        if attempt > 0:
+                            # 重试前重新获取下载链接
+                            info = await loop.run_in_executor(resolve_executor, self.downloader.resolve_download_info,
+                                                              song, quality)
+                        digest = await loop.run_in_executor(transfer_executor, self.downloader.download_file,
+                                                            info['url'], filepath, segmented, info.get('md5'))
+                        # 加入去重仓库时可能需要复制文件或重新计算哈希
+                        await loop.run_in_executor(transfer_executor, self.downloader.record_download,
+                                                   song, quality, filepath, digest)
+                        finish(index, True, filepath)
+                        break
+                    except CircuitOpenError as e:
+                        if attempt < self.downloader.max_retries - 1 and not stopped():
+                            print(f"Download API circuit open for song {song.name}, retrying in {e.retry_after:.0f} seconds...")
+                            await asyncio.sleep(max(e.retry_after, 0))
+                        else:
+                            finish(index, False, str(e))
+                            break
+                    except Exception as e:
+                        # 下载链接可能已失效，避免其他任务继续使用缓存的链接
+                        self.downloader.api_handler.invalidate_song_download_url(song.id, quality)
+                        if attempt < self.downloader.max_retries - 1 and not stopped():
+                            print(f"Download attempt {attempt+1} failed for song {song.name}, retrying in {self.downloader.retry_delay} seconds...")
+                            await asyncio.sleep(self.downloader.retry_delay)
+                        else:
+                            finish(index, False, f"Failed after {attempt+1} attempts: {str(e)}")
+                            break
+
+        async def feeder(iterator):
+            """从迭代器中逐首取出歌曲送入解析阶段，迭代器可能阻塞等待网络，在独立的线程中调用"""
+            source_executor = ThreadPoolExecutor(max_workers=1)
+            try:
+                while not stopped():
+                    song = await loop.run_in_executor(source_executor, next, iterator, None)
+                    if song is None:
+                        break
+                    song_list.append(song)
+                    results.append(None)
+                    await song_queue.put((len(song_list) - 1, song))
+            finally:
+                if stopped() and hasattr(iterator, 'close'):
+                    # 停止后不再接收剩余的歌曲，释放连接
+                    await loop.run_in_executor(source_executor, iterator.close)
+                source_executor.shutdown(wait=False)
+                for _ in range(self.resolve_workers):
+                    song_queue.put_nowait(None)
+
+        feeder_task = None
+        if song_list is songs:
+            for index, song in enumerate(songs):
+                song_queue.put_nowait((index, song))
+            for _ in range(self.resolve_workers):
+                song_queue.put_nowait(None)
+
+        try:
+            if song_list is not songs:
+                feeder_task = asyncio.create_task(feeder(iter(songs)))
+            resolvers = [asyncio.create_task(resolver()) for _ in range(self.resolve_workers)]
+            transfers = [asyncio.create_task(transfer()) for _ in range(self.transfer_workers)]
+
+            # 解析阶段全部结束后通知传输阶段退出
+            await asyncio.gather(*resolvers)
+            for _ in range(self.transfer_workers):
+                await url_queue.put(None)
+            await asyncio.gather(*transfers)
+            if feeder_task is not None:
+                # 获取歌曲时出错（如歌单API中途失败）在已收到的歌曲处理完后抛出
+                await feeder_task
+        finally:
+            resolve_executor.shutdown(wait=False)
+            transfer_executor.shutdown(wait=False)
+
+        return [result for result in results if result is not None]
@@ -0,0 +1,48 @@
+import ctypes
+import ctypes.util
+import os
+import sys
+
+# fallocate的标志位：只分配磁盘空间，不改变文件大小
+FALLOC_FL_KEEP_SIZE = 0x01
+
+_fallocate = None
+
+def _load_fallocate():
+    """加载libc中的fallocate函数，不可用时返回None"""
+    global _fallocate
+    if _fallocate is None:
+        _fallocate = False
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            function = getattr(libc, 'fallocate64', None) or libc.fallocate
+            function.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_int64, ctypes.c_int64]
+            function.restype = ctypes.c_int
+            _fallocate = function
+        except (OSError, AttributeError, TypeError):
+            pass
+    return _fallocate or None
+
+def preallocate(file, size, keep_size=False):
+    """一次性为文件预分配size字节的连续磁盘空间，减少碎片和元数据更新，成功返回True
+
+    keep_size为True时只分配空间、不改变文件大小（仅Linux支持），文件大小仍可作为断点续传的位置；
+    否则将文件扩展到size，不支持fallocate的系统上退回truncate
+    """
+    file.flush()
+    fd = file.fileno()
+    if keep_size:
+        if not sys.platform.startswith('linux'):
+            return False
+        fallocate = _load_fallocate()
+        return fallocate is not None and fallocate(fd, FALLOC_FL_KEEP_SIZE, 0, size) == 0
+
+    if hasattr(os, 'posix_fallocate'):
+        try:
+            os.posix_fallocate(fd, 0, size)
+            return True
+        except OSError:
+            # 文件系统不支持时（如部分网络文件系统）退回truncate
+            pass
+    file.truncate(size)
+    return False
@@ -0,0 +1,55 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from utils.circuit import CircuitOpenError
+
+class UrlPrefetcher:
+    """下载链接预取器：处理第i首歌时，在后台解析第i+1到i+k首歌的下载链接
+
+    解析结果写入APIHandler的下载链接缓存，轮到该歌曲下载时直接命中缓存，
+    若预取仍在进行中则等待同一次请求完成；请求间隔仍由APIHandler统一控制
+    """
+    def __init__(self, api_handler, songs, quality=None, lookahead=3, should_prefetch=None):
+        self.api_handler = api_handler
+        self.songs = songs
+        self.quality = quality
+        self.lookahead = max(0, int(lookahead))
+        # should_prefetch(song)返回False的歌曲不预取，例如将被跳过的已存在文件
+        self.should_prefetch = should_prefetch
+        self.lock = threading.Lock()
+        # 下一个待提交预取的歌曲下标
+        self.next_index = 0
+        self.executor = ThreadPoolExecutor(max_workers=1) if self.lookahead > 0 else None
+
+    def advance(self, index):
+        """第index首歌开始处理，提交其后lookahead首歌的预取任务"""
+        if self.executor is None:
+            return
+        with self.lock:
+            self.next_index = max(self.next_index, index + 1)
+            end = min(len(self.songs), index + 1 + self.lookahead)
+            while self.next_index < end:
+                self.executor.submit(self.prefetch, self.songs[self.next_index])
+                self.next_index += 1
+
+    def prefetch(self, song):
+        """解析单首歌曲的下载链接，失败时忽略，由下载流程自行重试"""
+        try:
+            if self.should_prefetch is not None and not self.should_prefetch(song):
+                return
+            self.api_handler.get_song_download_url(song.id, self.quality)
+        except CircuitOpenError:
+            # 下载API已熔断，由下载流程报告失败
+            pass
+        except Exception as e:
+            print(f"Prefetch failed for song {song.name}: {str(e)}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """停止预取，未开始的预取任务直接丢弃"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
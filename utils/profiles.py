@@ -0,0 +1,196 @@
+import operator
+import re
+from functools import lru_cache
+from utils.jsonstream import iter_array_items
+from utils.track import Track
+
+# 未配置data_paths.songs时依次尝试的歌曲列表位置，''表示响应本身就是歌曲列表
+DEFAULT_SONG_PATHS = ('', 'result.tracks', 'playlist.tracks', 'tracks')
+# 未配置data_paths.track_ids时依次尝试的完整歌曲ID列表位置
+DEFAULT_TRACK_ID_PATHS = ('playlist.trackIds', 'result.trackIds', 'trackIds')
+
+PATH_STEP = re.compile(r'([^.\[\]]+)|\[(\d+)\]')
+
+@lru_cache(maxsize=256)
+def parse_path(path):
+    """将'result.tracks'、'artists[0].name'形式的路径解析为步骤元组，如('artists', 0, 'name')；''为()"""
+    steps = []
+    for part in path.split('.') if path else []:
+        matches = list(PATH_STEP.finditer(part))
+        if not matches or ''.join(match.group(0) for match in matches) != part:
+            raise ValueError(f"无效的数据路径: {path}")
+        for key, index in (match.groups() for match in matches):
+            steps.append(int(index) if index is not None else key)
+    return tuple(steps)
+
+@lru_cache(maxsize=256)
+def compile_path(path):
+    """将路径编译为取值函数，同一路径只解析一次
+
+    取值失败时抛出KeyError、IndexError或TypeError；''返回数据本身
+    """
+    steps = parse_path(path)
+    if not steps:
+        return lambda data: data
+    if len(steps) == 1:
+        return operator.itemgetter(steps[0])
+
+    def accessor(data):
+        for step in steps:
+            data = data[step]
+        return data
+    return accessor
+
+def extract_song_id_from_url(url):
+    """从URL中提取歌曲ID"""
+    # 匹配URL中最后一个&id=或&id=后面的数字
+    match = re.search(r'id=([0-9]+)', url)
+    if match:
+        return match.group(1)
+    # 如果没有找到id参数，尝试匹配最后一个数字串
+    match = re.search(r'([0-9]+)$', url)
+    if match:
+        return match.group(1)
+    # 如果都没有找到，返回空字符串
+    return ''
+
+class PlaylistApiProfile:
+    """加载配置时编译一次的歌单API配置
+
+    data_paths中的songs（可选）、song_name、artist、song_id都支持'artists[0].name'形式的路径，
+    编译为取值函数后整理歌曲列表时不再解析路径；新增API只需修改配置。
+    track_ids（可选）为完整歌曲ID列表的路径，track_id（默认id）为其中每项的ID路径
+    """
+    DEFAULT_SONG_PATHS = DEFAULT_SONG_PATHS
+    REQUIRED_FIELDS = ('name', 'request_format', 'response_type', 'data_paths')
+    REQUIRED_PATHS = ('song_name', 'artist', 'song_id')
+
+    def __init__(self, config):
+        missing = [field for field in self.REQUIRED_FIELDS if field not in config]
+        missing += [f"data_paths.{field}" for field in self.REQUIRED_PATHS if field not in config.get('data_paths', {})]
+        if missing:
+            raise ValueError(f"歌单API配置{config.get('name', '')}缺少字段: {', '.join(missing)}")
+        if config['response_type'] != 'json':
+            raise ValueError(f"歌单API配置{config['name']}不支持的响应类型: {config['response_type']}")
+
+        self.config = config
+        self.name = config['name']
+        self.request_format = config['request_format']
+        data_paths = config['data_paths']
+        songs_path = data_paths.get('songs')
+        song_paths = (songs_path,) if songs_path is not None else self.DEFAULT_SONG_PATHS
+        self.song_list_accessors = [(path, compile_path(path)) for path in song_paths]
+        self.song_list_steps = [parse_path(path) for path in song_paths]
+        self.get_name = compile_path(data_paths['song_name'])
+        self.get_artist = compile_path(data_paths['artist'])
+        self.get_id = compile_path(data_paths['song_id'])
+        track_ids_path = data_paths.get('track_ids')
+        track_id_paths = (track_ids_path,) if track_ids_path is not None else DEFAULT_TRACK_ID_PATHS
+        self.track_id_steps = [parse_path(path) for path in track_id_paths]
+        self.get_track_id = compile_path(data_paths.get('track_id', 'id'))
+
+    def build_url(self, list_id):
+        """生成歌单请求地址"""
+        return self.request_format.format(list_id=list_id)
+
+    def find_songs(self, data):
+        """从响应中找到歌曲列表，找不到时返回None"""
+        for path, accessor in self.song_list_accessors:
+            try:
+                songs = accessor(data)
+            except (KeyError, IndexError, TypeError):
+                continue
+            if isinstance(songs, list):
+                return songs
+        return None
+
+    def iter_songs(self, chunks, track_ids=None):
+        """从响应的字节块中增量解析歌曲列表，每收到一批完整的歌曲就整理后返回
+
+        不需要完整的响应内容，也不会生成整个响应的JSON对象，第一批歌曲到达后即可开始处理。
+        track_ids为列表时，同时取出响应中的完整歌曲ID列表，全部解析完后追加到其中
+        """
+        captured = {} if track_ids is not None else None
+        capture = self.track_id_steps if track_ids is not None else ()
+        count = 0
+        for songs in iter_array_items(chunks, self.song_list_steps, capture=capture, captured=captured):
+            batch = self.normalize(songs, count)
+            count += len(songs)
+            if batch:
+                yield batch
+        if track_ids is not None:
+            track_ids.extend(self.extract_track_ids(captured))
+
+    def extract_track_ids(self, captured):
+        """从取出的值中按优先顺序找到完整歌曲ID列表，返回int列表，跳过无法解析的项"""
+        for steps in self.track_id_steps:
+            entries = captured.get(steps)
+            if not isinstance(entries, list):
+                continue
+            get_track_id = self.get_track_id
+            track_ids = []
+            for entry in entries:
+                try:
+                    track_ids.append(int(entry if isinstance(entry, (int, str)) else get_track_id(entry)))
+                except (KeyError, IndexError, TypeError, ValueError):
+                    continue
+            return track_ids
+        return []
+
+    def normalize(self, songs, start=0):
+        """将API返回的歌曲列表整理为Track列表，跳过无法解析的歌曲（包括ID不是数字的歌曲）
+
+        start为songs中第一首歌在整个歌单中的序号，用于错误信息
+        """
+        get_name = self.get_name
+        get_artist = self.get_artist
+        get_id = self.get_id
+        result = []
+        for i, song in enumerate(songs, start):
+            try:
+                song_id = get_id(song)
+                if isinstance(song_id, str) and 'http' in song_id:
+                    # 从URL中提取歌曲ID
+                    song_id = extract_song_id_from_url(song_id)
+                result.append(Track(song_id, get_name(song), get_artist(song)))
+            except Exception as e:
+                # 记录单首歌曲处理失败，但继续处理其他歌曲
+                print(f"{self.name}处理第{i+1}首歌曲失败: {str(e)}")
+        return result
+
+class SongDetailProfile(PlaylistApiProfile):
+    """编译后的歌曲详情API配置（apis.song_detail），按ID批量获取歌曲信息
+
+    request_format中的{ids}替换为逗号分隔的歌曲ID，每次最多batch_size个，同时进行concurrency个请求
+    """
+    DEFAULT_SONG_PATHS = ('songs', '')
+
+    def __init__(self, config):
+        # 请求间隔、熔断等按端点名称song_detail读取apis.song_detail中的配置
+        super().__init__({'response_type': 'json', **config, 'name': 'song_detail'})
+        self.batch_size = max(1, int(config.get('batch_size', 500)))
+        self.concurrency = max(1, int(config.get('concurrency', 4)))
+
+    def build_url(self, song_ids):
+        """生成一批歌曲ID的请求地址"""
+        return self.request_format.format(ids=','.join(str(song_id) for song_id in song_ids))
+
+def compile_song_detail_profile(config):
+    """编译歌曲详情API配置，未配置或配置有误时返回None"""
+    if not config:
+        return None
+    try:
+        return SongDetailProfile(config)
+    except ValueError as e:
+        print(str(e))
+        return None
+
+def compile_playlist_profiles(playlist_configs):
+    """编译所有歌单API配置，配置有误的API输出错误后跳过"""
+    profiles = []
+    for config in playlist_configs:
+        try:
+            profiles.append(PlaylistApiProfile(config))
+        except ValueError as e:
+            print(str(e))
+    return profiles
@@ -0,0 +1,110 @@
+import threading
+import time
+
+class TokenBucket:
+    """线程安全的令牌桶限速器
+
+    rate为每秒补充的令牌数（字节/秒），0表示不限速；capacity为桶容量，允许短时间突发。
+    令牌不足时允许透支，透支的部分通过等待偿还，因此单次取用量可以大于桶容量
+    """
+    def __init__(self, rate=0, burst_seconds=1.0):
+        self.lock = threading.Lock()
+        self.rate = 0
+        self.capacity = 0
+        self.tokens = 0
+        self.last_time = time.monotonic()
+        self.set_rate(rate, burst_seconds)
+
+    def set_rate(self, rate, burst_seconds=1.0):
+        """调整速率，可在传输过程中随时调用，立即对所有使用者生效"""
+        with self.lock:
+            self.refill()
+            self.rate = max(0, rate)
+            self.capacity = self.rate * burst_seconds
+            # 调整后不保留超出新容量的令牌和透支
+            self.tokens = min(max(self.tokens, -self.capacity), self.capacity)
+
+    def refill(self):
+        """按经过的时间补充令牌，调用方需持有锁"""
+        now = time.monotonic()
+        if self.rate > 0:
+            self.tokens = min(self.capacity, self.tokens + (now - self.last_time) * self.rate)
+        self.last_time = now
+
+    def consume(self, amount):
+        """取出amount个令牌，令牌不足时阻塞等待"""
+        with self.lock:
+            if self.rate <= 0:
+                return
+            self.refill()
+            self.tokens -= amount
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+
+# 进程内所有下载共享的带宽限速器
+bandwidth_limiter = TokenBucket()
+
+class AdaptiveRateLimiter:
+    """自适应的API请求间隔控制器（线程安全）
+
+    每个请求通过acquire()预约发送时间，请求成功后逐步缩短间隔，
+    遇到限流（HTTP 429/503）或超时时成倍拉长间隔，并遵守服务器返回的Retry-After。
+    max_interval未指定时为初始间隔的max_backoff倍；拉长后连续reset_after次成功时直接恢复到初始间隔
+    """
+    def __init__(self, interval=1.0, min_interval=0.1, max_interval=None, speedup=0.9, backoff=2.0,
+                 max_backoff=10, reset_after=5):
+        self.lock = threading.Lock()
+        self.min_interval = min_interval
+        if max_interval is None:
+            max_interval = interval * max_backoff
+        self.max_interval = max(max_interval, min_interval)
+        self.speedup = speedup
+        self.backoff = backoff
+        self.reset_after = reset_after
+        self.interval = min(max(interval, self.min_interval), self.max_interval)
+        # 初始或手动设置的间隔，限流结束后恢复到该值
+        self.base_interval = self.interval
+        # 连续成功的请求数
+        self.successes = 0
+        # 下一个请求最早可以发送的时间
+        self.next_time = 0
+
+    def set_interval(self, interval):
+        """手动设置当前间隔（秒），之后仍会根据响应情况自动调整"""
+        with self.lock:
+            # 手动设置的间隔小于下限时同时放宽下限
+            self.min_interval = min(self.min_interval, interval)
+            self.max_interval = max(self.max_interval, interval)
+            self.interval = max(interval, self.min_interval)
+            self.base_interval = self.interval
+
+    def acquire(self):
+        """预约下一个请求的发送时间，需要时阻塞等待"""
+        with self.lock:
+            now = time.monotonic()
+            scheduled = max(now, self.next_time)
+            self.next_time = scheduled + self.interval
+        if scheduled > now:
+            time.sleep(scheduled - now)
+
+    def on_success(self):
+        """请求成功，缩短间隔以提高请求速率；被拉长的间隔在连续成功后直接恢复到初始间隔"""
+        with self.lock:
+            self.successes += 1
+            if self.interval > self.base_interval and self.successes >= self.reset_after:
+                self.interval = self.base_interval
+            else:
+                self.interval = max(self.min_interval, self.interval * self.speedup)
+
+    def on_throttle(self, retry_after=None, backoff=True):
+        """请求被限流或超时，拉长间隔；retry_after为服务器要求等待的秒数
+
+        同一个请求的多次重试只应拉长一次间隔，之后的重试传入backoff=False，只遵守Retry-After
+        """
+        with self.lock:
+            self.successes = 0
+            if backoff:
+                self.interval = min(self.max_interval, max(self.interval, self.min_interval, 0.1) * self.backoff)
+            if retry_after is not None and retry_after > 0:
+                self.next_time = max(self.next_time, time.monotonic() + retry_after)
@@ -0,0 +1,49 @@
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+# 全局共享的HTTP会话，所有API请求和文件下载复用同一个连接池
+_session = None
+_session_lock = threading.Lock()
+
+def create_session(pool_connections=10, pool_maxsize=16, pool_block=True):
+    """创建带连接池和keep-alive的会话
+
+    pool_connections: 缓存连接池的主机数量
+    pool_maxsize: 每个主机保持的最大连接数
+    pool_block: 为True时同一主机的连接数不会超过pool_maxsize，多余的请求等待空闲连接
+    """
+    session = requests.Session()
+    # 重试由调用方控制，连接池本身不重试
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        pool_block=pool_block,
+        max_retries=0
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers['Connection'] = 'keep-alive'
+    return session
+
+def configure_session(config=None):
+    """根据配置文件中的http配置项重建全局会话"""
+    global _session
+    http_config = (config or {}).get('http', {})
+    session = create_session(
+        pool_connections=http_config.get('pool_connections', 10),
+        pool_maxsize=http_config.get('pool_maxsize', 16),
+        pool_block=http_config.get('pool_block', True)
+    )
+    # 旧会话可能仍有请求在进行（例如启动时的版本检查），不主动关闭，由垃圾回收释放
+    with _session_lock:
+        _session = session
+    return session
+
+def get_session():
+    """获取全局会话，尚未配置时使用默认参数创建"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = create_session()
+        return _session
@@ -0,0 +1,49 @@
+import json
+import os
+import threading
+import time
+
+class StartupCache:
+    """启动检查结果（最新版本号、API可用性等）的磁盘缓存
+
+    结果保存在JSON文件中，有效期内启动程序时直接使用上次的结果，不再请求网络
+    """
+    def __init__(self, path='startup_cache.json'):
+        self.path = path
+        self.lock = threading.Lock()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def get(self, key, ttl):
+        """获取ttl秒内保存的结果，返回(值, 保存时间)，没有或已过期时返回(None, None)"""
+        with self.lock:
+            entry = self.entries.get(key)
+        if not isinstance(entry, dict) or time.time() - entry.get('time', 0) > ttl:
+            return None, None
+        return entry.get('value'), entry['time']
+
+    def set(self, key, value):
+        """保存结果"""
+        with self.lock:
+            self.entries[key] = {'value': value, 'time': time.time()}
+            self.save()
+
+    def invalidate(self, key):
+        """删除指定结果，下次启动时重新检查"""
+        with self.lock:
+            if self.entries.pop(key, None) is not None:
+                self.save()
+
+    def save(self):
+        """写入文件，调用时需持有self.lock，写入失败时忽略"""
+        # 先写临时文件再替换，避免程序中途退出时留下损坏的缓存文件
+        temp_path = self.path + '.tmp'
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"Failed to save startup cache: {str(e)}")
@@ -0,0 +1,106 @@
+import hashlib
+import os
+import shutil
+import sys
+import threading
+
+class ContentStore:
+    """按内容哈希去重存储已下载歌曲的仓库
+
+    目录结构:
+        objects/ab/abcdef...    文件内容，以SHA-256命名
+        refs/<音质>/<歌曲ID>     记录(歌曲ID, 音质)对应的内容哈希
+
+    同一首歌再次下载到其他文件夹时，直接从仓库硬链接过去；
+    不支持硬链接时依次尝试reflink和复制
+    """
+    def __init__(self, root):
+        self.root = root
+        self.objects_dir = os.path.join(root, 'objects')
+        self.refs_dir = os.path.join(root, 'refs')
+        self.lock = threading.Lock()
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.refs_dir, exist_ok=True)
+
+    def object_path(self, digest):
+        """内容哈希对应的对象文件路径"""
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def ref_path(self, song_id, quality):
+        """(歌曲ID, 音质)对应的引用文件路径"""
+        return os.path.join(self.refs_dir, str(quality), str(song_id))
+
+    def lookup(self, song_id, quality):
+        """查找仓库中的歌曲文件，返回对象文件路径，不存在时返回None"""
+        try:
+            with open(self.ref_path(song_id, quality), 'r', encoding='utf-8') as f:
+                digest = f.read().strip()
+        except OSError:
+            return None
+        path = self.object_path(digest)
+        return path if digest and os.path.exists(path) else None
+
+    def add(self, song_id, quality, filepath, digest=None):
+        """将已下载的文件加入仓库，返回内容哈希；digest为None时读取文件计算"""
+        if digest is None:
+            digest = self.hash_file(filepath)
+
+        object_path = self.object_path(digest)
+        with self.lock:
+            if not os.path.exists(object_path):
+                os.makedirs(os.path.dirname(object_path), exist_ok=True)
+                link_file(filepath, object_path)
+
+            # 先写临时文件再替换，避免并发读取到不完整的引用
+            ref_path = self.ref_path(song_id, quality)
+            os.makedirs(os.path.dirname(ref_path), exist_ok=True)
+            temp_path = ref_path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(digest)
+            os.replace(temp_path, ref_path)
+        return digest
+
+    def materialize(self, song_id, quality, target):
+        """将仓库中的歌曲链接到目标路径，返回内容哈希，仓库中没有该歌曲时返回None"""
+        object_path = self.lookup(song_id, quality)
+        if object_path is None:
+            return None
+        os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+        link_file(object_path, target)
+        return os.path.basename(object_path)
+
+    def hash_file(self, filepath):
+        """计算文件的SHA-256"""
+        sha256 = hashlib.sha256()
+        with open(filepath, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                sha256.update(block)
+        return sha256.hexdigest()
+
+def link_file(src, dst):
+    """依次尝试硬链接、reflink和复制，将src放到dst"""
+    temp_path = dst + '.tmp'
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+
+    try:
+        os.link(src, temp_path)
+    except OSError:
+        if not reflink(src, temp_path):
+            shutil.copy2(src, temp_path)
+    os.replace(temp_path, dst)
+
+def reflink(src, dst):
+    """在支持的文件系统（btrfs、XFS等）上创建写时复制的副本，成功返回True"""
+    if not sys.platform.startswith('linux'):
+        return False
+    import fcntl
+    FICLONE = 0x40049409
+    try:
+        with open(src, 'rb') as src_file, open(dst, 'wb') as dst_file:
+            fcntl.ioctl(dst_file.fileno(), FICLONE, src_file.fileno())
+        return True
+    except OSError:
+        if os.path.exists(dst):
+            os.remove(dst)
+        return False
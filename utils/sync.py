@@ -0,0 +1,118 @@
+import os
+import shutil
+from utils.pipeline import DownloadPipeline
+
+class PlaylistSyncer:
+    """歌单增量同步：与上次同步到同一目录的歌曲列表比较，只下载新增和尚未下载成功的歌曲
+
+    removed_action控制已从歌单中移除的歌曲：
+        'keep'    保留文件（默认）
+        'delete'  删除文件
+        'archive' 移动到保存目录下的_archive文件夹
+    """
+    REMOVED_ACTIONS = ('keep', 'delete', 'archive')
+
+    def __init__(self, downloader):
+        self.downloader = downloader
+        self.api_handler = downloader.api_handler
+        self.manifest = downloader.manifest
+
+    def sync(self, list_id, save_path, quality=None, speed_limit=0, filename_format=0, removed_action='keep',
+             max_workers=None, resolve_workers=None, callback=None, should_stop=None):
+        """同步歌单，返回包含added、removed、unchanged、pending、complete、results的统计字典"""
+        plan = self.plan(list_id, save_path, quality)
+        results = self.apply(plan, speed_limit, filename_format, removed_action,
+                             max_workers, resolve_workers, callback, should_stop)
+        return {
+            'added': len(plan['added']),
+            'removed': len(plan['removed']),
+            'unchanged': plan['unchanged'],
+            'pending': len(plan['pending']),
+            'complete': plan['complete'],
+            'results': results
+        }
+
+    def plan(self, list_id, save_path, quality=None):
+        """获取歌单并与上次同步的结果比较，返回同步计划，不下载任何文件
+
+        pending为本次需要下载的歌曲：新增歌曲加上清单中没有记录（以前未下载成功）的歌曲。
+        没有获取到完整的歌单时（complete为False）仍下载已知的歌曲，但不判断移除的歌曲，也不更新快照
+        """
+        if self.manifest is None:
+            raise ValueError("增量同步需要启用下载清单（download.manifest_path）")
+        quality = quality or self.api_handler.get_default_quality()
+
+        songs = self.api_handler.get_playlist_songs(list_id)
+        complete = getattr(songs, 'complete', True)
+        if not complete:
+            print(f"警告: 歌单{list_id}的歌曲列表不完整，本次不处理移除的歌曲，也不更新同步快照")
+        current_ids = [str(song.id) for song in songs]
+        current_set = set(current_ids)
+
+        # 首次同步时视为全部新增
+        previous_ids = self.manifest.get_playlist_snapshot(list_id, save_path) or []
+        previous_set = set(previous_ids)
+
+        downloaded_ids = self.manifest.downloaded_ids(save_path, quality)
+        return {
+            'list_id': list_id,
+            'save_path': save_path,
+            'quality': quality,
+            'current_ids': current_ids,
+            'added': [song_id for song_id in current_ids if song_id not in previous_set],
+            'removed': [song_id for song_id in previous_ids if song_id not in current_set] if complete else [],
+            'unchanged': sum(1 for song_id in current_ids if song_id in previous_set),
+            'pending': [song for song in songs if str(song.id) not in downloaded_ids],
+            'complete': complete
+        }
+
+    def apply(self, plan, speed_limit=0, filename_format=0, removed_action='keep',
+              max_workers=None, resolve_workers=None, callback=None, should_stop=None):
+        """执行同步计划：下载pending中的歌曲，歌单完整时处理移除的歌曲并保存本次快照，返回下载结果列表
+
+        callback和should_stop的含义与DownloadPipeline.run相同
+        """
+        if removed_action not in self.REMOVED_ACTIONS:
+            raise ValueError(f"Unsupported removed action: {removed_action}")
+        list_id = plan['list_id']
+        save_path = plan['save_path']
+        quality = plan['quality']
+
+        results = []
+        if plan['pending']:
+            pipeline = DownloadPipeline(
+                self.downloader,
+                resolve_workers or self.downloader.resolve_workers,
+                max_workers or self.downloader.max_workers
+            )
+            results = pipeline.run(plan['pending'], save_path, quality, speed_limit, True, filename_format,
+                                   callback=callback, should_stop=should_stop)
+
+        # 停止或歌单不完整时不更新快照，下次同步仍能识别出本次的新增和移除
+        if plan.get('complete', True) and (should_stop is None or not should_stop()):
+            if removed_action != 'keep':
+                for song_id in plan['removed']:
+                    # 同一目录中的其他歌单仍包含该歌曲时保留文件
+                    if not self.manifest.in_other_playlist(song_id, save_path, list_id):
+                        self.handle_removed(song_id, quality, save_path, removed_action)
+            self.manifest.save_playlist_snapshot(list_id, save_path, plan['current_ids'])
+
+        return results
+
+    def handle_removed(self, song_id, quality, save_path, removed_action):
+        """删除或归档已从歌单中移除的歌曲"""
+        record = self.manifest.find(song_id, quality, save_path)
+        if record is None:
+            return
+        path = record['path']
+        try:
+            if os.path.exists(path):
+                if removed_action == 'delete':
+                    os.remove(path)
+                else:
+                    archive_dir = os.path.join(save_path, '_archive')
+                    os.makedirs(archive_dir, exist_ok=True)
+                    shutil.move(path, os.path.join(archive_dir, os.path.basename(path)))
+            self.manifest.remove(path)
+        except OSError as e:
+            print(f"Failed to {removed_action} removed song {path}: {str(e)}")
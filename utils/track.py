@@ -0,0 +1,44 @@
+import sys
+
+class Track:
+    """歌单中的一首歌曲
+
+    使用__slots__，对象没有__dict__；歌曲ID保存为int，歌手名用sys.intern去重，
+    同一歌手的歌曲共用一个字符串。十万首以上的歌单中内存占用明显小于字典
+    """
+    __slots__ = ('id', 'name', 'artist')
+
+    def __init__(self, id, name, artist):
+        self.id = int(id)
+        self.name = str(name)
+        self.artist = sys.intern(str(artist))
+
+    @classmethod
+    def from_dict(cls, data):
+        """从{'id', 'name', 'artist'}字典（缓存文件等）创建"""
+        return cls(data['id'], data['name'], data['artist'])
+
+    def to_dict(self):
+        """转换为可以写入JSON的字典"""
+        return {'name': self.name, 'artist': self.artist, 'id': self.id}
+
+    def __eq__(self, other):
+        if not isinstance(other, Track):
+            return NotImplemented
+        return self.id == other.id and self.name == other.name and self.artist == other.artist
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __repr__(self):
+        return f"Track(id={self.id}, name={self.name!r}, artist={self.artist!r})"
+
+class TrackList(list):
+    """歌单的Track列表
+
+    complete为False表示这不是歌单当前完整的歌曲列表（部分歌曲详情获取失败或使用了过期的缓存），
+    可以用来下载，但不能据此判断哪些歌曲已从歌单中移除
+    """
+    def __init__(self, songs=(), complete=True):
+        super().__init__(songs)
+        self.complete = complete
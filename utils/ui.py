@@ -13,14 +13,19 @@ from qfluentwidgets import (
 import sys
 import os
 import threading
+import time
 import requests
 
 # 全局版本号变量
-CURRENT_VERSION = "1.0.5"
+CURRENT_VERSION = "1.25.9"
 
 from utils.api import APIHandler
 from utils.downloader import SongDownloader
-from utils.ncm_converter import NCMConverter
+from utils.pipeline import DownloadPipeline
+from utils.session import get_session
+from utils.sync import PlaylistSyncer
+from utils.jobqueue import JobQueue, JobRunner
+from utils.startup_cache import StartupCache
 
 class PlaylistPage(ScrollArea):
     """歌单下载页面"""
@@ -50,6 +55,12 @@ class PlaylistPage(ScrollArea):
         self.list_id_entry = LineEdit()
         self.list_id_entry.setFixedWidth(200)
         id_layout.addWidget(self.list_id_entry)
+        # 加入队列时使用的优先级，数值越大越先执行
+        id_layout.addWidget(QLabel("队列优先级:"))
+        self.priority_entry = LineEdit()
+        self.priority_entry.setText("0")
+        self.priority_entry.setFixedWidth(60)
+        id_layout.addWidget(self.priority_entry)
         id_layout.addStretch()
         self.card_layout.addLayout(id_layout)
         
@@ -72,7 +83,8 @@ class PlaylistPage(ScrollArea):
         self.speed_entry.setText("2048")
         self.speed_entry.setFixedWidth(80)
         quality_speed_layout.addWidget(self.speed_entry)
-        quality_speed_layout.addWidget(QLabel("0表示无限制"))
+        quality_speed_layout.addWidget(QLabel("0表示无限制，下载中修改后回车立即生效"))
+        self.speed_entry.editingFinished.connect(parent.apply_speed_limit)
         self.card_layout.addLayout(quality_speed_layout)
         
         # API请求间隔行
@@ -86,6 +98,20 @@ class PlaylistPage(ScrollArea):
         self.save_interval_button.clicked.connect(parent.save_request_interval)
         interval_layout.addWidget(self.save_interval_button)
         interval_layout.addStretch()
+        
+        # 并发下载数
+        interval_layout.addWidget(QLabel("并发下载数:"))
+        self.workers_entry = LineEdit()
+        self.workers_entry.setText(str(parent.downloader.max_workers))
+        self.workers_entry.setFixedWidth(80)
+        interval_layout.addWidget(self.workers_entry)
+        
+        # 解析下载链接的并发数
+        interval_layout.addWidget(QLabel("解析并发数:"))
+        self.resolve_workers_entry = LineEdit()
+        self.resolve_workers_entry.setText(str(parent.downloader.resolve_workers))
+        self.resolve_workers_entry.setFixedWidth(80)
+        interval_layout.addWidget(self.resolve_workers_entry)
         self.card_layout.addLayout(interval_layout)
         
         # 保存路径行
@@ -104,6 +130,25 @@ class PlaylistPage(ScrollArea):
         self.skip_existing_checkbox.setChecked(True)  # 默认勾选
         self.card_layout.addWidget(self.skip_existing_checkbox)
         
+        # 分段下载复选框
+        self.segmented_checkbox = CheckBox("无损/Hi-Res大文件分段并行下载")
+        self.segmented_checkbox.setChecked(parent.downloader.segment_enabled)
+        self.card_layout.addWidget(self.segmented_checkbox)
+        
+        # 增量同步行
+        sync_layout = QHBoxLayout()
+        self.sync_checkbox = CheckBox("增量同步（只下载上次同步后新增的歌曲）")
+        self.sync_checkbox.setChecked(False)
+        sync_layout.addWidget(self.sync_checkbox)
+        sync_layout.addWidget(QLabel("已移除的歌曲:"))
+        self.removed_action_combobox = ComboBox()
+        self.removed_action_combobox.addItems(["保留", "删除", "归档"])
+        self.removed_action_combobox.setCurrentIndex(0)  # 默认保留
+        self.removed_action_combobox.setFixedWidth(100)
+        sync_layout.addWidget(self.removed_action_combobox)
+        sync_layout.addStretch()
+        self.card_layout.addLayout(sync_layout)
+        
         # 命名格式选择
         format_layout = QHBoxLayout()
         format_layout.addWidget(QLabel("输出文件名格式:"))
@@ -126,9 +171,18 @@ class PlaylistPage(ScrollArea):
         self.stop_download_button.setEnabled(False)
         button_layout.addWidget(self.stop_download_button)
         
+        # 任务队列按钮
+        self.enqueue_button = PushButton("加入队列")
+        self.enqueue_button.clicked.connect(parent.enqueue_playlist)
+        button_layout.addWidget(self.enqueue_button)
+        
+        self.run_queue_button = PushButton("运行队列")
+        self.run_queue_button.clicked.connect(parent.start_queue)
+        button_layout.addWidget(self.run_queue_button)
+        
         # API检查按钮
         self.check_api_button = PushButton("检查api")
-        self.check_api_button.clicked.connect(parent.test_api_feasibility)
+        self.check_api_button.clicked.connect(lambda: parent.test_api_feasibility(use_cache=False))
         button_layout.addWidget(self.check_api_button)
         
         button_layout.addStretch()
@@ -340,6 +394,34 @@ class LogPage(ScrollArea):
         self.main_layout.addStretch()
 
 
+class LazyPage(QWidget):
+    """延迟创建的页面：首次显示时才创建实际页面，缩短启动时间
+    
+    factory()返回实际页面，创建后调用on_loaded(page)
+    """
+    def __init__(self, object_name, factory, on_loaded=None, parent=None):
+        super().__init__(parent=parent)
+        self.setObjectName(object_name)
+        self.factory = factory
+        self.on_loaded = on_loaded
+        self.page = None
+        self.page_layout = QVBoxLayout(self)
+        self.page_layout.setContentsMargins(0, 0, 0, 0)
+    
+    def load(self):
+        """创建实际页面，已创建时直接返回"""
+        if self.page is None:
+            self.page = self.factory()
+            self.page_layout.addWidget(self.page)
+            if self.on_loaded is not None:
+                self.on_loaded(self.page)
+        return self.page
+    
+    def showEvent(self, event):
+        self.load()
+        super().showEvent(event)
+
+
 class MusicDownloaderUI(FluentWindow):
     """主窗口"""
     # 定义信号，用于在子线程中更新UI
@@ -354,6 +436,7 @@ class MusicDownloaderUI(FluentWindow):
     ncm_button_state_signal = pyqtSignal(bool, bool)
     api_test_signal = pyqtSignal(str, str, int)  # 用于API测试结果通知，参数：title, content, type(0:success, 1:warning, 2:error)
     version_signal = pyqtSignal(str)  # 用于更新最新版本号的信号
+    circuit_signal = pyqtSignal(str, str)  # API熔断器状态变化，参数：端点, 新状态
     
     def __init__(self):
         super().__init__()
@@ -365,9 +448,6 @@ class MusicDownloaderUI(FluentWindow):
         # 连接版本更新信号
         self.version_signal.connect(self.update_latest_version)
         
-        # 获取最新版本号
-        self.get_latest_version()
-        
         # 连接信号槽
         self.log_signal.connect(self.log_slot)
         self.progress_signal.connect(self.progress_slot)
@@ -379,35 +459,38 @@ class MusicDownloaderUI(FluentWindow):
         self.button_state_signal.connect(self.button_state_slot)
         self.ncm_button_state_signal.connect(self.ncm_button_state_slot)
         self.api_test_signal.connect(self.api_test_result_slot)
+        self.circuit_signal.connect(self.circuit_state_slot)
         
         # 初始化API处理器
         self.api_handler = APIHandler()
+        # 熔断器可能在下载线程中变化，通过信号切换到界面线程
+        self.api_handler.add_circuit_listener(lambda endpoint, old_state, new_state: self.circuit_signal.emit(endpoint, new_state))
+        # 启动检查结果的磁盘缓存，有效期（秒）内启动时不再请求网络
+        startup_config = self.api_handler.config.get('startup', {})
+        self.startup_cache = StartupCache(startup_config.get('cache_path', 'startup_cache.json'))
+        self.version_ttl = startup_config.get('version_ttl', 6 * 3600)
+        self.api_test_ttl = startup_config.get('api_test_ttl', 3600)
         self.downloader = SongDownloader(self.api_handler)
+        self.syncer = PlaylistSyncer(self.downloader)
+        # 持久化任务队列
+        self.job_queue = JobQueue(self.api_handler.config.get('download', {}).get('queue_path', 'jobs.db'))
+        self.job_runner = JobRunner(self.downloader, self.job_queue)
         
-        # 尝试初始化NCM转换器
-        try:
-            self.ncm_converter = NCMConverter()
-        except FileNotFoundError as e:
-            self.ncm_converter = None
-            InfoBar.warning(
-                title="NCM转换器初始化失败",
-                content=f"{e}\nNCM转换功能将不可用",
-                orient=Qt.Horizontal,
-                isClosable=True,
-                position=InfoBarPosition.BOTTOM_RIGHT,
-                duration=5000,
-                parent=self
-            )
+        # NCM转换器在首次转换时才初始化
+        self.ncm_converter = None
         
         # 停止标志
         self.stop_download = False
         self.stop_convert = False
         
-        # 创建页面
+        # 日志页面创建前的日志，创建时一次性写入
+        self.pending_logs = []
+        
+        # 创建页面，主页启动时即显示，其他页面在首次切换到时才创建
         self.home_page = HomePage(self)
-        self.playlist_page = PlaylistPage(self)
-        self.ncm_page = NcmConvertPage(self)
-        self.log_page = LogPage(self)
+        self.playlist_page = LazyPage("playlistPage", lambda: PlaylistPage(self), self.bind_playlist_page, self)
+        self.ncm_page = LazyPage("ncmConvertPage", lambda: NcmConvertPage(self), self.bind_ncm_page, self)
+        self.log_page = LazyPage("logPage", lambda: LogPage(self), self.bind_log_page, self)
         
         # 添加页面到导航栏
         self.addSubInterface(self.home_page, FIF.HOME, "主页")
@@ -415,29 +498,6 @@ class MusicDownloaderUI(FluentWindow):
         self.addSubInterface(self.ncm_page, FIF.UPDATE, "NCM转换")
         self.addSubInterface(self.log_page, FIF.COMMAND_PROMPT, "日志", NavigationItemPosition.BOTTOM)
         
-        # 获取页面组件引用
-        self.list_id_entry = self.playlist_page.list_id_entry
-        self.quality_combobox = self.playlist_page.quality_combobox
-        self.speed_entry = self.playlist_page.speed_entry
-        self.save_path_entry = self.playlist_page.save_path_entry
-        self.skip_existing_checkbox = self.playlist_page.skip_existing_checkbox
-        self.filename_format_combobox = self.playlist_page.filename_format_combobox
-        self.download_button = self.playlist_page.download_button
-        self.stop_download_button = self.playlist_page.stop_download_button
-        self.progress_bar = self.playlist_page.progress_bar
-        self.progress_label = self.playlist_page.progress_label
-        
-        self.ncm_input_entry = self.ncm_page.ncm_input_entry
-        self.ncm_output_entry = self.ncm_page.ncm_output_entry
-        self.ncm_skip_existing_checkbox = self.ncm_page.ncm_skip_existing_checkbox
-        self.ncm_flip_filename_checkbox = self.ncm_page.ncm_flip_filename_checkbox
-        self.convert_button = self.ncm_page.convert_button
-        self.stop_convert_button = self.ncm_page.stop_convert_button
-        self.ncm_progress_bar = self.ncm_page.ncm_progress_bar
-        self.ncm_progress_label = self.ncm_page.ncm_progress_label
-        
-        self.log_text = self.log_page.log_text
-        
         # 添加版本号显示到主页
         self.current_version_label = QLabel(f"当前版本: {CURRENT_VERSION}")
         self.current_version_label.setAlignment(Qt.AlignCenter)
@@ -453,13 +513,60 @@ class MusicDownloaderUI(FluentWindow):
         self.help_label.setStyleSheet("color: #666666; font-size: 14px;")
         self.home_page.card_layout.addWidget(self.help_label)
         
-        # 启动时自动测试API可行性
-        self.test_api_feasibility()
+        # 获取最新版本号
+        self.get_latest_version()
+        
+        # 提示上次未完成的队列任务
+        unfinished_jobs = self.job_queue.unfinished_jobs()
+        if unfinished_jobs:
+            self.log(f"任务队列中有 {len(unfinished_jobs)} 个未完成的任务，点击「运行队列」继续")
+        
+        # 启动时自动测试API可行性，有效期内使用上次成功的结果
+        self.test_api_feasibility(use_cache=True)
         
         # 延迟显示MessageBox，确保主窗口已经加载完成
         from PyQt5.QtCore import QTimer
         QTimer.singleShot(100, self.show_startup_message)
     
+    def bind_playlist_page(self, page):
+        """歌单下载页面创建后获取页面组件引用"""
+        self.list_id_entry = page.list_id_entry
+        self.priority_entry = page.priority_entry
+        self.quality_combobox = page.quality_combobox
+        self.speed_entry = page.speed_entry
+        self.workers_entry = page.workers_entry
+        self.resolve_workers_entry = page.resolve_workers_entry
+        self.interval_entry = page.interval_entry
+        self.save_path_entry = page.save_path_entry
+        self.skip_existing_checkbox = page.skip_existing_checkbox
+        self.segmented_checkbox = page.segmented_checkbox
+        self.sync_checkbox = page.sync_checkbox
+        self.removed_action_combobox = page.removed_action_combobox
+        self.filename_format_combobox = page.filename_format_combobox
+        self.download_button = page.download_button
+        self.stop_download_button = page.stop_download_button
+        self.run_queue_button = page.run_queue_button
+        self.progress_bar = page.progress_bar
+        self.progress_label = page.progress_label
+    
+    def bind_ncm_page(self, page):
+        """NCM转换页面创建后获取页面组件引用"""
+        self.ncm_input_entry = page.ncm_input_entry
+        self.ncm_output_entry = page.ncm_output_entry
+        self.ncm_skip_existing_checkbox = page.ncm_skip_existing_checkbox
+        self.ncm_flip_filename_checkbox = page.ncm_flip_filename_checkbox
+        self.convert_button = page.convert_button
+        self.stop_convert_button = page.stop_convert_button
+        self.ncm_progress_bar = page.ncm_progress_bar
+        self.ncm_progress_label = page.ncm_progress_label
+    
+    def bind_log_page(self, page):
+        """日志页面创建后获取页面组件引用，并写入此前缓存的日志"""
+        self.log_text = page.log_text
+        if self.pending_logs:
+            self.log_text.append('\n'.join(self.pending_logs))
+            self.pending_logs = []
+    
 
     
     def browse_save_path(self):
@@ -480,12 +587,8 @@ class MusicDownloaderUI(FluentWindow):
         if path:
             self.ncm_output_entry.setText(path)
     
-    def start_download(self):
-        """开始下载歌单"""
-        list_id = self.list_id_entry.text().strip()
-        quality = self.quality_combobox.currentText()
-        save_path = self.save_path_entry.text()
-        
+    def get_transfer_settings(self):
+        """读取下载速度和并发数设置，输入无效时提示错误并返回None"""
         try:
             speed_limit = int(self.speed_entry.text())
         except ValueError:
@@ -498,7 +601,39 @@ class MusicDownloaderUI(FluentWindow):
                 duration=3000,
                 parent=self
             )
+            return None
+        
+        try:
+            max_workers = int(self.workers_entry.text())
+            resolve_workers = int(self.resolve_workers_entry.text())
+            if max_workers < 1 or resolve_workers < 1:
+                raise ValueError("并发数必须大于0")
+        except ValueError:
+            InfoBar.error(
+                title="错误",
+                content="并发下载数和解析并发数必须是大于0的整数",
+                orient=Qt.Horizontal,
+                isClosable=True,
+                position=InfoBarPosition.BOTTOM_RIGHT,
+                duration=3000,
+                parent=self
+            )
+            return None
+        
+        # 获取分段下载选项
+        self.downloader.segment_enabled = self.segmented_checkbox.isChecked()
+        return speed_limit, max_workers, resolve_workers
+    
+    def start_download(self):
+        """开始下载歌单"""
+        list_id = self.list_id_entry.text().strip()
+        quality = self.quality_combobox.currentText()
+        save_path = self.save_path_entry.text()
+        
+        settings = self.get_transfer_settings()
+        if settings is None:
             return
+        speed_limit, max_workers, resolve_workers = settings
         
         if not list_id:
             InfoBar.error(
@@ -517,58 +652,88 @@ class MusicDownloaderUI(FluentWindow):
         
         # 禁用下载按钮，启用停止按钮
         self.download_button.setEnabled(False)
+        self.run_queue_button.setEnabled(False)
         self.stop_download_button.setEnabled(True)
         
         # 获取跳过已存在文件选项
         skip_existing = self.skip_existing_checkbox.isChecked()
         # 获取文件名格式
         filename_format = self.filename_format_combobox.currentIndex()  # 0: 歌名 - 作者, 1: 作者 - 歌名
+        # 获取增量同步选项
+        sync_mode = self.sync_checkbox.isChecked()
+        removed_action = PlaylistSyncer.REMOVED_ACTIONS[self.removed_action_combobox.currentIndex()]
         
         # 启动下载线程
-        threading.Thread(target=self.download_playlist, args=(list_id, save_path, quality, speed_limit, skip_existing, filename_format), daemon=True).start()
+        threading.Thread(target=self.download_playlist, args=(list_id, save_path, quality, speed_limit, skip_existing, filename_format, max_workers, resolve_workers, sync_mode, removed_action), daemon=True).start()
     
-    def download_playlist(self, list_id, save_path, quality, speed_limit, skip_existing, filename_format):
+    def download_playlist(self, list_id, save_path, quality, speed_limit, skip_existing, filename_format, max_workers=1, resolve_workers=1,
+                          sync_mode=False, removed_action='keep'):
         """下载歌单的线程函数"""
         try:
             self.log(f"开始下载歌单: {list_id}")
             self.log(f"音质: {quality}, 保存路径: {save_path}")
+            self.log(f"并发下载数: {max_workers}, 解析并发数: {resolve_workers}")
             self.log(f"跳过已存在文件: {'是' if skip_existing else '否'}")
             self.log(f"文件名格式: {'歌名 - 作者' if filename_format == 0 else '作者 - 歌名'}")
             
             # 获取歌单歌曲
             self.log("正在获取歌单歌曲列表...")
-            songs = self.api_handler.get_playlist_songs(list_id)
-            self.log(f"获取到 {len(songs)} 首歌曲")
+            if sync_mode:
+                # 增量同步：只下载与上次同步相比新增或尚未下载成功的歌曲
+                plan = self.syncer.plan(list_id, save_path, quality)
+                songs = plan['pending']
+                self.log(f"增量同步: 新增 {len(plan['added'])} 首, 移除 {len(plan['removed'])} 首, "
+                         f"未变化 {plan['unchanged']} 首, 待下载 {len(songs)} 首")
+                if not plan['complete']:
+                    self.log("歌单不完整，本次不处理移除的歌曲，请稍后重新同步")
+            else:
+                songs = self.api_handler.get_playlist_songs(list_id)
+                self.log(f"获取到 {len(songs)} 首歌曲")
             
             # 开始下载
-            success_count = 0
-            fail_count = 0
-            skip_count = 0
+            counts = {'success': 0, 'fail': 0, 'skip': 0, 'done': 0}
             total_songs = len(songs)
             
-            for i, song in enumerate(songs):
-                # 检查停止标志
-                if self.stop_download:
-                    self.log("下载已停止")
-                    break
+            def on_song_done(i, song, success, message):
+                """单首歌曲完成回调，在当前线程中依次执行"""
+                counts['done'] += 1
                 
                 # 通过信号槽更新进度
-                progress = (i + 1) / total_songs * 100
-                self.progress_signal.emit(int(progress), f"正在下载: {song['artist']} - {song['name']} ({i+1}/{total_songs})")
-                
-                self.log(f"[{i+1}/{total_songs}] 正在处理: {song['artist']} - {song['name']}")
-                success, message = self.downloader.download_song(song, save_path, quality, speed_limit, skip_existing, filename_format)
+                progress = counts['done'] / total_songs * 100
+                self.progress_signal.emit(int(progress), f"已完成: {song.artist} - {song.name} ({counts['done']}/{total_songs})")
                 
                 if success:
                     if "已跳过" in message:
                         self.log(f"[{i+1}/{total_songs}] {message}")
-                        skip_count += 1
+                        counts['skip'] += 1
                     else:
                         self.log(f"[{i+1}/{total_songs}] 下载成功: {message}")
-                        success_count += 1
+                        counts['success'] += 1
                 else:
                     self.log(f"[{i+1}/{total_songs}] 下载失败: {message}")
-                    fail_count += 1
+                    counts['fail'] += 1
+            
+            if sync_mode:
+                self.syncer.apply(
+                    plan, speed_limit, filename_format, removed_action, max_workers, resolve_workers,
+                    callback=on_song_done,
+                    should_stop=lambda: self.stop_download
+                )
+            else:
+                # 解析直链与文件传输分两个阶段并行进行
+                pipeline = DownloadPipeline(self.downloader, resolve_workers, max_workers)
+                pipeline.run(
+                    songs, save_path, quality, speed_limit, skip_existing, filename_format,
+                    callback=on_song_done,
+                    should_stop=lambda: self.stop_download
+                )
+            
+            if self.stop_download:
+                self.log("下载已停止")
+            
+            success_count = counts['success']
+            fail_count = counts['fail']
+            skip_count = counts['skip']
             
             # 通过信号槽更新完成状态
             self.progress_signal.emit(100, "下载完成")
@@ -596,12 +761,119 @@ class MusicDownloaderUI(FluentWindow):
             # 发送按钮状态更新信号
             self.button_state_signal.emit(True, False)
     
+    def enqueue_playlist(self):
+        """将当前歌单和设置加入任务队列"""
+        list_id = self.list_id_entry.text().strip()
+        try:
+            priority = int(self.priority_entry.text())
+        except ValueError:
+            InfoBar.error(
+                title="错误",
+                content="队列优先级必须是整数",
+                orient=Qt.Horizontal,
+                isClosable=True,
+                position=InfoBarPosition.BOTTOM_RIGHT,
+                duration=3000,
+                parent=self
+            )
+            return
+        
+        if not list_id:
+            InfoBar.error(
+                title="错误",
+                content="请输入歌单ID",
+                orient=Qt.Horizontal,
+                isClosable=True,
+                position=InfoBarPosition.BOTTOM_RIGHT,
+                duration=3000,
+                parent=self
+            )
+            return
+        
+        job_id = self.job_queue.add_job(
+            list_id,
+            self.save_path_entry.text(),
+            self.quality_combobox.currentText(),
+            self.filename_format_combobox.currentIndex(),
+            self.skip_existing_checkbox.isChecked(),
+            priority
+        )
+        self.log(f"歌单 {list_id} 已加入任务队列（任务{job_id}，优先级 {priority}）")
+        InfoBar.success(
+            title="成功",
+            content=f"歌单 {list_id} 已加入任务队列",
+            orient=Qt.Horizontal,
+            isClosable=True,
+            position=InfoBarPosition.BOTTOM_RIGHT,
+            duration=3000,
+            parent=self
+        )
+    
+    def start_queue(self):
+        """运行任务队列中所有未完成的任务"""
+        settings = self.get_transfer_settings()
+        if settings is None:
+            return
+        
+        # 重置停止标志
+        self.stop_download = False
+        
+        # 禁用下载按钮，启用停止按钮
+        self.download_button.setEnabled(False)
+        self.run_queue_button.setEnabled(False)
+        self.stop_download_button.setEnabled(True)
+        
+        # 启动队列线程
+        threading.Thread(target=self.run_queue, args=settings, daemon=True).start()
+    
+    def run_queue(self, speed_limit, max_workers, resolve_workers):
+        """运行任务队列的线程函数"""
+        try:
+            self.log(f"开始运行任务队列，并发下载数: {max_workers}, 解析并发数: {resolve_workers}")
+            
+            def on_song_done(done, total, job, song, success, message):
+                """单首歌曲完成回调"""
+                self.progress_signal.emit(int(done / total * 100), f"任务{job['id']}: {song.artist} - {song.name} ({done}/{total})")
+                if success:
+                    self.log(f"[任务{job['id']}] {message}")
+                else:
+                    self.log(f"[任务{job['id']}] 下载失败: {song.artist} - {song.name}: {message}")
+            
+            counts = self.job_runner.run(
+                speed_limit, max_workers, resolve_workers,
+                callback=on_song_done,
+                should_stop=lambda: self.stop_download,
+                log=self.log
+            )
+            
+            if self.stop_download:
+                self.log("队列已停止，未完成的歌曲将在下次运行队列时继续")
+            
+            self.progress_signal.emit(100, "队列运行完成")
+            self.log(f"任务队列运行完成! 成功: {counts['success']}, 跳过: {counts['skip']}, 失败: {counts['fail']}, 总计: {counts['total']}")
+            self.download_complete_signal.emit(counts['success'] + counts['skip'], counts['fail'])
+        except Exception as e:
+            import traceback
+            self.log(f"任务队列运行失败: {str(e)}")
+            self.log(f"错误详细信息: {traceback.format_exc()}")
+            self.download_error_signal.emit(f"任务队列运行失败: {str(e)}")
+        finally:
+            # 发送按钮状态更新信号
+            self.button_state_signal.emit(True, False)
+    
     def start_ncm_convert(self):
         """开始NCM转换"""
+        if self.ncm_converter is None:
+            # 首次转换时才查找ncmdump
+            from utils.ncm_converter import NCMConverter
+            try:
+                self.ncm_converter = NCMConverter()
+            except FileNotFoundError as e:
+                self.log(f"NCM转换器初始化失败: {str(e)}")
         if self.ncm_converter is None:
             InfoBar.error(
                 title="错误",
-                content="NCM转换器未初始化，无法使用转换功能",
+                content="未找到ncmdump，NCM转换功能不可用",
                 orient=Qt.Horizontal,
                 isClosable=True,
                 position=InfoBarPosition.BOTTOM_RIGHT,
@@ -741,10 +1013,19 @@ class MusicDownloaderUI(FluentWindow):
         self.stop_download = True
         self.log("正在停止下载...")
     
+    def apply_speed_limit(self):
+        """下载过程中调整总下载速度"""
+        try:
+            speed_limit = int(self.speed_entry.text())
+        except ValueError:
+            return
+        self.downloader.set_speed_limit(speed_limit)
+        self.log(f"总下载速度限制已设置为 {speed_limit} KiB/s" if speed_limit > 0 else "已取消下载速度限制")
+    
     def save_request_interval(self):
         """保存API请求间隔设置"""
         try:
-            interval = int(self.playlist_page.interval_entry.text())
+            interval = int(self.interval_entry.text())
             if interval < 0:
                 raise ValueError("请求间隔不能为负数")
             
@@ -770,8 +1051,17 @@ class MusicDownloaderUI(FluentWindow):
                 parent=self
             )
     
-    def test_api_feasibility(self):
-        """测试API可行性"""
+    def test_api_feasibility(self, use_cache=False):
+        """测试API可行性，use_cache为True时有效期内直接使用上次成功的测试结果"""
+        # 歌单API配置变化后缓存的结果不再适用
+        cache_key = 'api_test:' + ','.join(api.name for api in self.api_handler.playlist_profiles)
+        if use_cache:
+            result, tested_at = self.startup_cache.get(cache_key, self.api_test_ttl)
+            if result:
+                minutes = int((time.time() - tested_at) / 60)
+                self.log(f"API测试成功（{minutes}分钟前的测试结果，可点击「检查api」重新检测）")
+                return
+        
         def test_api():
             """测试API的线程函数"""
             try:
@@ -779,17 +1069,24 @@ class MusicDownloaderUI(FluentWindow):
                 self.log("正在测试API可行性...")
                 # 使用一个公开的歌单ID进行测试
                 test_playlist_id = "3778678"
-                songs = self.api_handler.get_playlist_songs(test_playlist_id)
+                songs = self.api_handler.get_playlist_songs(test_playlist_id, use_cache=False)
                 
                 if songs:
                     self.log("API测试成功")
+                    self.startup_cache.set(cache_key, True)
+                    # 输出各歌单API的统计，下次按此顺序优先请求
+                    for name, stats in self.api_handler.playlist_stats.snapshot().items():
+                        latency = f"{stats['latency'] * 1000:.0f}ms" if stats.get('latency') is not None else "无成功记录"
+                        self.log(f"{name}: 平均延迟 {latency}, 成功率 {stats['success_rate']:.0%}")
                     # 使用信号槽机制显示InfoBar通知
                     self.api_test_signal.emit("API测试成功", "API服务正常，可以使用下载功能", 0)
                 else:
+                    self.startup_cache.invalidate(cache_key)
                     self.log("API测试失败: 未获取到歌曲列表")
                     # 使用信号槽机制显示InfoBar通知
                     self.api_test_signal.emit("API测试警告", "API服务可能异常，获取歌曲列表为空。可手动再次检测", 1)
             except Exception as e:
+                self.startup_cache.invalidate(cache_key)
                 self.log(f"API测试失败: {str(e)}")
                 # 使用信号槽机制显示InfoBar通知
                 self.api_test_signal.emit("API测试失败", f"API服务异常，无法使用下载功能: {str(e)}。可手动再次检测", 2)
@@ -798,14 +1095,20 @@ class MusicDownloaderUI(FluentWindow):
         threading.Thread(target=test_api, daemon=True).start()
         
     def get_latest_version(self):
-        """获取最新版本号"""
+        """获取最新版本号，有效期内使用缓存的结果"""
+        latest_version, _ = self.startup_cache.get('latest_version', self.version_ttl)
+        if latest_version:
+            self.update_latest_version(latest_version)
+            return
+        
         def fetch_version():
             """获取版本号的线程函数"""
             try:
                 url = "https://ncm.dgtsr.top/version/"
-                response = requests.get(url, timeout=5)
+                response = get_session().get(url, timeout=5)
                 response.raise_for_status()
                 latest_version = response.text.strip()
+                self.startup_cache.set('latest_version', latest_version)
                 self.version_signal.emit(latest_version)
             except Exception as e:
                 self.log(f"获取最新版本号失败: {str(e)}")
@@ -855,6 +1158,26 @@ class MusicDownloaderUI(FluentWindow):
                 parent=self
             )
     
+    def circuit_state_slot(self, endpoint, state):
+        """API熔断器状态变化槽函数"""
+        name = "下载API" if endpoint == 'song_download' else endpoint
+        if state == 'open':
+            breaker = self.api_handler.get_circuit_breaker(endpoint)
+            self.log(f"{name}连续失败，已暂停请求，{breaker.recovery_timeout}秒后自动重试")
+            InfoBar.warning(
+                title="API暂时不可用",
+                content=f"{name}连续失败，相关歌曲将直接失败，{breaker.recovery_timeout}秒后自动重试",
+                orient=Qt.Horizontal,
+                isClosable=True,
+                position=InfoBarPosition.BOTTOM_RIGHT,
+                duration=5000,
+                parent=self
+            )
+        elif state == 'half_open':
+            self.log(f"{name}正在尝试恢复...")
+        else:
+            self.log(f"{name}已恢复")
+    
     def stop_convert_task(self):
         """停止转换任务"""
         self.stop_convert = True
@@ -867,6 +1190,10 @@ class MusicDownloaderUI(FluentWindow):
     
     def log_slot(self, message):
         """日志更新槽函数"""
+        if self.log_page.page is None:
+            # 日志页面尚未创建
+            self.pending_logs.append(message)
+            return
         self.log_text.append(message)
         # 滚动到底部
         self.log_text.verticalScrollBar().setValue(self.log_text.verticalScrollBar().maximum())
@@ -927,6 +1254,7 @@ class MusicDownloaderUI(FluentWindow):
     def button_state_slot(self, download_enabled, stop_enabled):
         """按钮状态更新槽函数"""
         self.download_button.setEnabled(download_enabled)
+        self.run_queue_button.setEnabled(download_enabled)
         self.stop_download_button.setEnabled(stop_enabled)
     
     def ncm_progress_slot(self, progress, text):